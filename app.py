@@ -1,3 +1,6 @@
+import os
+import uuid
+
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -14,35 +17,76 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
-from services.llm_extractor import extract_preferences_from_text, is_greeting, get_greeting_response
-from services.preference_utils import BASE_PREFERENCES, merge_preferences
-from services.recommender import recommend_foods
-from services.data_loader import load_food_dataset,build_recipe_documents
-from services.conversation_policy import next_action
-from services.preference_utils import normalize_course
-from services.semantic_ranker import SemanticRanker
-from services.conversation_guard import missing_signals, follow_up_question
-from services.refinement_detector import detect_refinement
-from services.conversation_policy import relax_preferences
-from services.explanation_engine import explain_recommendation
+from services.llm_extractor import cache_namespace
+from services.llm_client import AsyncExtractionClient
+from services.llm_cache import DEFAULT_CACHE_PATH, ExtractionCache
+from services.rule_extractor import CatalogRules
+from services.preference_utils import BASE_PREFERENCES
+from services.live_catalog import LiveCatalog
+from services.result_cache import RankedResultCache
+from services.chat_pipeline import ChatPipeline
+from services.card_view import CardFragments, message_summary
+from services.chat_history import ChatHistory, prune_spills
+from services.thumbnails import ThumbnailCache
+
+# Set to keep each session's folded messages on disk instead of dropping them
+SPILL_DIR = os.getenv("CHAT_SPILL_DIR")
+
+@st.cache_resource
+def load_catalog():
+    # Picks up edits from the update journal without a restart
+    catalog = LiveCatalog.open("data/foods_data.csv")
+    catalog.start()
+    return catalog
 
 @st.cache_resource
-def load_data():
-    return load_food_dataset("data/foods_data.csv")
+def load_thumbnails():
+    return ThumbnailCache()
 
 @st.cache_resource
-def load_semantic_ranker():
-    df = load_food_dataset("data/foods_data.csv")
-    documents = build_recipe_documents(df)
-    return SemanticRanker(documents)
+def load_card_fragments():
+    return CardFragments()
 
-if "semantic_ranker" not in st.session_state:
-    st.session_state.semantic_ranker = load_semantic_ranker()
+@st.cache_resource
+def prepare_spill_dir():
+    # Once per process: drop spill files of sessions a crash left behind
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    prune_spills(SPILL_DIR)
+    return SPILL_DIR
+
+def new_history():
+    spill_path = None
+    if SPILL_DIR:
+        spill_path = os.path.join(prepare_spill_dir(), f"{uuid.uuid4().hex}.jsonl")
+    return ChatHistory(spill_path=spill_path)
 
-df = load_data()
+@st.cache_resource
+def load_rule_extractor():
+    # Rebuilt whenever a catalog edit changes the version
+    return CatalogRules(load_catalog())
 
-if "semantic_ranker" not in st.session_state:
-    st.session_state.semantic_ranker = load_semantic_ranker(df)
+@st.cache_resource
+def load_extraction_cache():
+    return ExtractionCache(DEFAULT_CACHE_PATH, namespace=cache_namespace())
+
+@st.cache_resource
+def load_extraction_client():
+    return AsyncExtractionClient(
+        cache=load_extraction_cache(),
+        rules=load_rule_extractor()
+    )
+
+@st.cache_resource
+def load_pipeline():
+    return ChatPipeline(
+        load_catalog(),
+        load_extraction_client(),
+        result_cache=RankedResultCache()
+    )
+
+pipeline = load_pipeline()
+thumbnails = load_thumbnails()
+fragments = load_card_fragments()
 
 
 # @st.cache_data
@@ -110,23 +154,21 @@ with st.sidebar:
     # st.markdown("### 🛠️ Session Controls")
 
     if st.button("🔄 Start New Recommendation", use_container_width=True):
-        st.session_state.messages = []
+        st.session_state.history.clear()
         st.session_state.preferences = BASE_PREFERENCES.copy()
-        st.session_state.relaxed_once = False
         st.rerun()
 
     # st.markdown("---")
     # st.markdown(f"**Version:** {APP_VERSION}")
 
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# Messages hold recipe ids, scores and explanations; cards are resolved
+# against the shared catalog when rendered
+if "history" not in st.session_state:
+    st.session_state.history = new_history()
 
 if "preferences" not in st.session_state:
     st.session_state.preferences = BASE_PREFERENCES.copy()
 
-if "relaxed_once" not in st.session_state:
-    st.session_state.relaxed_once = False    
-
 
 st.markdown(
     f"""
@@ -137,191 +179,56 @@ st.markdown(
     """,
 )
 
-for msg in st.session_state.messages:
+def message_cards(msg):
+    recipes = msg.get("recipes", [])
+    cards = fragments.get(pipeline.bundle, [recipe["food_id"] for recipe in recipes])
+    return [(recipe, card) for recipe, card in zip(recipes, cards) if card is not None]
+
+def render_message(msg):
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
-        # Display recipes if present in the message
-        if "recipes" in msg:
-            for recipe in msg["recipes"]:
-                col1, col2 = st.columns([1, 3], gap="small")
-                with col1:
-                    st.image(recipe["imgurl"], width="stretch")
-                with col2:
-                    st.markdown(f"**{recipe['name'].title()}**")
-                    # Show cuisine and course tags
-                    cuisine = recipe.get("cuisine", "").title() if recipe.get("cuisine") else ""
-                    course = recipe.get("course", "").title() if recipe.get("course") else ""
-                    tags = " | ".join(filter(None, [cuisine, course]))
-                    if tags:
-                        st.caption(tags)
-                    st.markdown(f"⏱️ {recipe['total_time_minutes']} minutes")
-                    st.markdown(recipe["summary"])
-                    # Ingredients
-                    if "ingredients" in recipe and recipe["ingredients"]:
-                        ingredients_list = recipe["ingredients"]
-                        st.markdown("**Ingredients**")
-                        ingredients_text = ", ".join([ing.title() for ing in ingredients_list[:10]])
-                        if len(ingredients_list) > 10:
-                            ingredients_text += f" *and {len(ingredients_list) - 10} more...*"
-                        st.markdown(ingredients_text)
-                    # Nutrition table
-                    if "nutrition" in recipe:
-                        nutrition = recipe["nutrition"]
-                        st.markdown("**Nutrition Facts**")
-                        nutrition_html = f"""
-                        <table style="width:100%; border-collapse: collapse; font-size: 14px;">
-                            <tr style="background-color: #f8f9fa;">
-                                <td style="padding: 8px; border: 1px solid #dee2e6;"><strong>Calories</strong></td>
-                                <td style="padding: 8px; border: 1px solid #dee2e6;"><strong>Protein</strong></td>
-                                <td style="padding: 8px; border: 1px solid #dee2e6;"><strong>Carbs</strong></td>
-                                <td style="padding: 8px; border: 1px solid #dee2e6;"><strong>Fat</strong></td>
-                            </tr>
-                            <tr>
-                                <td style="padding: 8px; border: 1px solid #dee2e6;">{nutrition['Calories']}</td>
-                                <td style="padding: 8px; border: 1px solid #dee2e6;">{nutrition['Protein']}</td>
-                                <td style="padding: 8px; border: 1px solid #dee2e6;">{nutrition['Carbs']}</td>
-                                <td style="padding: 8px; border: 1px solid #dee2e6;">{nutrition['Fat']}</td>
-                            </tr>
-                        </table>
-                        """
-                        st.markdown(nutrition_html, unsafe_allow_html=True)
-                st.markdown(f"🧠 *Why this?* {recipe['explanation']}")
-                st.divider()
+        for recipe, card in message_cards(msg):
+            col1, col2 = st.columns([1, 3], gap="small")
+            with col1:
+                # Local thumbnail when cached, else the recipe site's image
+                st.image(thumbnails.cached(card["food_id"], card["image"]) or card["image"], width="stretch")
+            with col2:
+                # Catalog text stays plain markdown; only the escaped table is HTML
+                st.markdown(card["body"])
+                if card["nutrition"]:
+                    st.markdown(card["nutrition"], unsafe_allow_html=True)
+            st.markdown(f"🧠 *Why this?* {recipe['explanation']}")
+            st.divider()
+
+def add_message(msg):
+    names = [card["name"] for _, card in message_cards(msg)]
+    st.session_state.history.append(msg, message_summary(msg, names))
+
+# Older messages only show as one line each, so a rerun renders a bounded
+# number of cards however long the conversation gets
+history = st.session_state.history
+if history.folded:
+    with st.expander(f"Earlier messages ({history.folded_count})"):
+        st.markdown("\n".join(history.folded))
+
+for msg in history.messages:
+    render_message(msg)
 
 user_input = st.chat_input("Tell me what you're in the mood for...")
 
 if user_input:
-    st.session_state.relaxed_once = False
-    # Store user message
-    st.session_state.messages.append(
-        {"role": "user", "content": user_input}
-    )
-
-    # Display user message immediately
-    with st.chat_message("user"):
-        st.markdown(user_input)
-
-    # Check if it's a greeting
-    if is_greeting(user_input):
-        greeting_response = get_greeting_response()
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": greeting_response
-        })
-        st.rerun()
-
-    # Extract preferences using LLM
-    new_prefs = extract_preferences_from_text(user_input)
-    refinements = detect_refinement(user_input)
-
-    new_prefs = {**new_prefs, **refinements}
-
-    if new_prefs.get("course"):
-        new_prefs["course"] = normalize_course(new_prefs["course"])
-
-    # Merge into session memory
-    st.session_state.preferences = merge_preferences(
-        st.session_state.preferences,
-        new_prefs
-    )
-
-    # Get recommendations
-    decision = next_action(st.session_state.preferences)
-
-    if decision["type"] == "ask":
-        assistant_text = decision["message"]
-
-        st.session_state.messages.append(
-            {"role": "assistant", "content": assistant_text}
-        )
-        st.rerun()
-
-    else:
-        missing = missing_signals(st.session_state.preferences)
-
-        if missing:
-            assistant_text = follow_up_question(missing)
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": assistant_text
-            })
-        else:
-            if "offset" not in st.session_state.preferences:
-                st.session_state.preferences["offset"] = 0
-
-            recs, constraints_relaxed = recommend_foods(
-                df,
-                st.session_state.preferences,
-                st.session_state.semantic_ranker
-            )
-
-            # If no results, try relaxing preferences once
-            relaxed_message = ""
-            if recs.empty and not st.session_state.relaxed_once:
-                relaxed = relax_preferences(st.session_state.preferences)
-
-                if relaxed != st.session_state.preferences:
-                    st.session_state.preferences = relaxed
-                    st.session_state.preferences["offset"] = 0
-                    st.session_state.relaxed_once = True
-                    relaxed_message = "I relaxed some constraints to find better matches.\n\n"
-
-                    # Retry with relaxed preferences
-                    recs, constraints_relaxed = recommend_foods(
-                        df,
-                        st.session_state.preferences,
-                        st.session_state.semantic_ranker
-                    )
-
-            # Add message if some constraints were relaxed
-            if constraints_relaxed and not relaxed_message:
-                relaxed_message = "Couldn't find exact matches for all your criteria. Showing closest matches.\n\n"
-
-            if recs.empty:
-                if relaxed_message:
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": relaxed_message + "Unfortunately, I still couldn't find any matching recipes. Try changing cuisine, time, or ingredients."
-                    })
-                else:
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": "No recipes match your preferences. Try changing cuisine, time, or ingredients."
-                    })
-
-            else:
-                # Build recommendation message with recipe data
-                recipe_data = []
-                for _, row in recs.iterrows():
-                    explanation = explain_recommendation(row, st.session_state.preferences)
-                    recipe_data.append({
-                        "imgurl": row["imgurl"],
-                        "name": row["name"],
-                        "cuisine": row.get("cuisine", ""),
-                        "course": row.get("course", ""),
-                        "total_time_minutes": row["total_time_minutes"],
-                        "summary": row["summary"],
-                        "explanation": explanation,
-                        "ingredients": row.get("ingredients_list", []),
-                        "nutrition": {
-                            "Calories": f"{row.get('calories_kcal', 0):.0f} kcal",
-                            "Protein": f"{row.get('protein_g', 0):.1f} g",
-                            "Carbs": f"{row.get('carbs_g', 0):.1f} g",
-                            "Fat": f"{row.get('fat_g', 0):.1f} g"
-                        }
-                    })
-
-                time_note = ""
-                if st.session_state.preferences.get("max_cook_time"):
-                    time_note = f"⏱️ Showing recipes around {st.session_state.preferences['max_cook_time']} minutes\n\n"
-
-                st.session_state.messages.append({
-                    "role": "assistant",
-                    "content": relaxed_message + time_note + "### 🍽️ Here's what I recommend:",
-                    "recipes": recipe_data
-                })
-
-        st.rerun()
+    message = {"role": "user", "content": user_input}
+    render_message(message)
+
+    state = {"preferences": st.session_state.preferences}
+    reply = pipeline.handle(user_input, state)
+    st.session_state.preferences = state["preferences"]
+    # Render just the new turn; the next rerun draws it from history
+    render_message(reply)
+    # Cards above use the source URLs for now; later reruns get the thumbnails
+    thumbnails.prefetch((card["food_id"], card["image"]) for _, card in message_cards(reply))
+    add_message(message)
+    add_message(reply)
 
 with st.expander("🔍 Current Preferences"):
     prefs = st.session_state.preferences
@@ -0,0 +1,175 @@
+"""Recall@k vs latency of the dense LSA/IVF ranker against exact TF-IDF.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_dense --sizes 10000 100000 1000000 --out bench_dense.json
+
+For each size a synthetic catalog is loaded (see benchmarks.run_pipeline)
+and both a ``SemanticRanker`` and a ``DenseRanker`` are fitted on its
+documents. Queries are built from random preference sets the
+way ``recommend_foods`` builds them, then ranked by:
+
+- ``tfidf``: the exact TF-IDF ranker (the reference)
+- ``lsa_exact``: the dense ranker probing every list
+- ``lsa_nprobe_<n>``: the dense ranker probing ``n`` lists
+
+Recall is tie-aware, since templated documents share scores: a returned
+row counts as a hit when its reference score is at least the k-th best
+reference score. ``recall_vs_tfidf`` measures the ranking change of the
+dense model as a whole; ``recall_vs_exact`` only the loss from probing.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks import synthetic_catalog
+from benchmarks.synthetic_catalog import write_catalog
+from services.data_loader import build_recipe_documents, load_catalog_tables
+from services.dense_ranker import DENSE_DIMS, DenseRanker
+from services.recommender import build_query_from_prefs
+from services.semantic_ranker import SemanticRanker
+
+
+def sample_queries(count, seed=0):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        prefs = {
+            "cuisine": rng.choice([None, *synthetic_catalog.CUISINES]),
+            "course": rng.choice([None, *synthetic_catalog.COURSES]),
+            "keywords": rng.sample(
+                synthetic_catalog.ADJECTIVES + synthetic_catalog.DISHES + synthetic_catalog.PROTEINS,
+                rng.randint(1, 3),
+            ),
+        }
+        queries.append(build_query_from_prefs(prefs))
+    return queries
+
+
+def latencies(rank, queries, top_k):
+    seconds, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(rank(query, top_k=top_k)[0])
+        seconds.append(time.perf_counter() - start)
+    ms = sorted(s * 1000 for s in seconds)
+    timing = {
+        "ms_median": statistics.median(ms),
+        "ms_p95": ms[min(len(ms) - 1, int(0.95 * len(ms)))],
+    }
+    return results, timing
+
+
+class Reference:
+    """Exact scores of one ranker for a query, for tie-aware recall."""
+
+    def __init__(self, scores_of, n_docs, top_k):
+        self.scores_of = scores_of
+        scores = scores_of(np.arange(n_docs))
+        self.kth = np.partition(scores, -top_k)[-top_k]
+
+    def recall(self, found):
+        """Share of ``found`` rows scoring at least the k-th best score."""
+        return float(np.mean(self.scores_of(found) >= self.kth))
+
+
+def run_size(rows, work_dir, nprobes, n_queries, top_k, dims):
+    csv_path = os.path.join(work_dir, f"synthetic_{rows}.csv")
+    if not os.path.exists(csv_path):
+        write_catalog(csv_path, rows)
+    df, _ = load_catalog_tables(csv_path, cache_dir=os.path.join(work_dir, f"snapshots_{rows}"))
+    documents = build_recipe_documents(df)
+    report = {"rows": len(df), "rankers": {}}
+    del df
+
+    start = time.perf_counter()
+    tfidf = SemanticRanker(documents)
+    report["tfidf_fit_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dense = DenseRanker(documents, dims=dims)
+    report.update({
+        "lsa_fit_seconds": time.perf_counter() - start,
+        "dims": dense.projection.shape[1],
+        "n_lists": dense.n_lists,
+        "vectors_mb": dense.vectors.nbytes / 2**20,
+    })
+    del documents
+
+    queries = sample_queries(n_queries)
+    n_docs = dense.n_docs
+    tfidf_refs = [
+        Reference(lambda rows, q=q: (tfidf.doc_vectors[rows] @ q.T).toarray().ravel(), n_docs, top_k)
+        for q in tfidf.vectorizer.transform(queries)
+    ]
+    dense_refs = [
+        Reference(lambda rows, v=v: dense.vectors[dense.slots[rows]] @ v, n_docs, top_k)
+        for v in dense.embed(queries)
+    ]
+
+    def entry(found, timing):
+        return {
+            **timing,
+            "recall_vs_tfidf": statistics.mean(ref.recall(f) for f, ref in zip(found, tfidf_refs)),
+            "recall_vs_exact": statistics.mean(ref.recall(f) for f, ref in zip(found, dense_refs)),
+        }
+
+    report["rankers"]["tfidf"] = entry(*latencies(tfidf.rank, queries, top_k))
+    dense.nprobe = dense.n_lists
+    report["rankers"]["lsa_exact"] = entry(*latencies(dense.rank, queries, top_k))
+    for nprobe in nprobes:
+        if nprobe >= dense.n_lists:
+            continue
+        dense.nprobe = nprobe
+        report["rankers"][f"lsa_nprobe_{nprobe}"] = entry(*latencies(dense.rank, queries, top_k))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=100)
+    parser.add_argument("--dims", type=int, default=DENSE_DIMS)
+    parser.add_argument("--work-dir", help="where generated CSVs and snapshots are kept (default: a temp dir)")
+    parser.add_argument("--out", help="JSON report path (default: stdout)")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="food-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+
+    results = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "top_k": args.top_k,
+        "queries": args.queries,
+        "runs": [],
+    }
+    for rows in args.sizes:
+        results["runs"].append(run_size(rows, work_dir, args.nprobe, args.queries, args.top_k, args.dims))
+        print(f"{rows:>9,} rows done", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Row-wise vs vectorized candidate scoring.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_scoring --sizes 1000 100000 1000000
+
+Candidates are sampled (with replacement) from data/foods_data.csv. The
+legacy path is the DataFrame.apply(axis=1) code that recommend_foods used
+before the scoring engine. The vectorized path is the one recommend_foods
+runs: one ``scan_candidates`` pass over the candidates' text, then the
+scoring functions against its ``CandidateMatches``. Both paths are checked
+for identical scores and ordering before timings are reported.
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.catalog_index import CatalogIndex
+from services.data_loader import load_catalog_tables
+from services.scoring import ingredient_filter_mask, keyword_filter_mask, score_candidates
+from services.term_matcher import scan_candidates
+
+PREFS = {
+    "keywords": ["chicken", "spicy", "rice"],
+    "max_cook_time": 30,
+    "selected_ingredients": ["salt", "onion", "chicken"],
+}
+
+
+def legacy_score_row(row, prefs):
+    score = 0.0
+    for kw in prefs.get("keywords", []):
+        if kw in row["keyword"]:
+            score += 2
+        if kw in row["summary"]:
+            score += 1
+    if prefs.get("max_cook_time"):
+        score += max(
+            0,
+            (prefs["max_cook_time"] - row["total_time_minutes"])
+            / prefs["max_cook_time"]
+        )
+    for ing in prefs.get("selected_ingredients", []):
+        if ing in row["ingredients_list"]:
+            score += 1.5
+    return score
+
+
+def legacy(ranked, prefs):
+    max_time = prefs["max_cook_time"]
+
+    def has_ingredient(row):
+        text = str(row.get("ingredients_text", "")).lower()
+        items = row.get("ingredients_list", [])
+        for ing in prefs["selected_ingredients"]:
+            ing = ing.lower()
+            if ing in text or any(ing in item.lower() for item in items):
+                return True
+        return False
+
+    def has_keyword(row):
+        searchable = (
+            str(row.get("name", "")).lower() + " " +
+            str(row.get("summary", "")).lower() + " " +
+            str(row.get("keyword", "")).lower() + " " +
+            str(row.get("ingredients_text", "")).lower()
+        )
+        return any(kw.lower() in searchable for kw in prefs["keywords"])
+
+    def cook_time_bonus(row):
+        diff = row["total_time_minutes"] - max_time
+        if diff <= 0:
+            return 0.5
+        return -min(diff / max_time, 5.0)
+
+    ing_mask = ranked.apply(has_ingredient, axis=1).to_numpy()
+    kw_mask = ranked.apply(has_keyword, axis=1).to_numpy()
+    final = (
+        ranked["semantic_score"]
+        + ranked.apply(lambda r: legacy_score_row(r, prefs), axis=1)
+        + ranked.apply(cook_time_bonus, axis=1)
+    )
+    return ing_mask, kw_mask, final.to_numpy()
+
+
+def vectorized(index, positions, semantic, times, prefs):
+    # Same term set as recommend_foods: lowercased and as-given keywords, ingredients
+    keywords, ingredients = prefs["keywords"], prefs["selected_ingredients"]
+    terms = [kw.lower() for kw in keywords] + list(keywords) + [ing.lower() for ing in ingredients]
+    matches = scan_candidates(index, positions, terms)
+    ing_mask = ingredient_filter_mask(matches, positions, ingredients)
+    kw_mask = keyword_filter_mask(matches, positions, keywords)
+    final = score_candidates(matches, positions, semantic, times, prefs)
+    return ing_mask, kw_mask, final
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def run(size, base, legacy_limit, seed=0):
+    rng = np.random.default_rng(seed)
+    catalog = base.sample(size, replace=True, random_state=seed).reset_index(drop=True)
+    build_s, index = timed(CatalogIndex, catalog)
+
+    positions = np.arange(size)
+    semantic = rng.random(size)
+    times = catalog["total_time_minutes"].to_numpy()
+
+    # Warm-up, so one-off costs are not timed
+    vectorized(index, positions, semantic, times, PREFS)
+    vec_s, vec = timed(vectorized, index, positions, semantic, times, PREFS)
+    report = {"rows": size, "index_build_s": build_s, "vectorized_s": vec_s}
+
+    if size <= legacy_limit:
+        ranked = catalog.copy()
+        ranked["semantic_score"] = semantic
+        legacy_s, old = timed(legacy, ranked, PREFS)
+        assert (old[0] == vec[0]).all() and (old[1] == vec[1]).all()
+        assert (old[2] == vec[2]).all(), "final_score differs from the row-wise path"
+        old_order = pd.Series(old[2]).sort_values(ascending=False).index
+        new_order = pd.Series(vec[2]).sort_values(ascending=False).index
+        assert (old_order == new_order).all()
+        report["legacy_s"] = legacy_s
+        report["speedup"] = legacy_s / vec_s
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="data/foods_data.csv")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument(
+        "--legacy-limit", type=int, default=1_000_000,
+        help="skip the row-wise path above this many rows",
+    )
+    args = parser.parse_args()
+
+    base, ingredients = load_catalog_tables(args.data)
+    # The row-wise path reads per-row lists
+    base = base.assign(ingredients_list=ingredients.take(range(len(base))))
+    for size in args.sizes:
+        r = run(size, base, args.legacy_limit)
+        line = f"{r['rows']:>9,} rows  index {r['index_build_s']:8.3f}s  vectorized {r['vectorized_s'] * 1000:9.2f}ms"
+        if "legacy_s" in r:
+            line += f"  row-wise {r['legacy_s'] * 1000:11.2f}ms  speedup {r['speedup']:7.1f}x"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
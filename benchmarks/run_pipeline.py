@@ -0,0 +1,160 @@
+"""End-to-end pipeline benchmark on synthetic catalogs.
+
+Run from the repository root:
+
+    python -m benchmarks.run_pipeline --sizes 10000 100000 1000000 --out bench_pipeline.json
+
+For each size a catalog is generated with benchmarks.synthetic_catalog
+(reused from --work-dir if already there), then every stage is timed
+``--repeat`` times and run once more under tracemalloc for its peak
+Python/numpy allocation. Tracing is kept out of the timed runs because it
+slows allocation-heavy code several-fold. Results are written as JSON so
+runs before and after a change can be diffed.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from copy import deepcopy
+
+from benchmarks.synthetic_catalog import write_catalog
+from services.catalog_bundle import load_catalog_bundle
+from services.catalog_index import CatalogIndex
+from services.data_loader import build_recipe_documents, load_food_dataset
+from services.preference_utils import BASE_PREFERENCES
+from services.recommender import build_query_from_prefs, recommend_foods
+from services.result_cache import RankedResultCache
+from services.semantic_ranker import SemanticRanker
+
+
+def _profile(**prefs):
+    return {**deepcopy(BASE_PREFERENCES), **prefs}
+
+
+# Fixed so numbers stay comparable across commits; cover the cheap path,
+# every filter, the relaxed (no strict ingredient match) path, and a
+# selective hard filter that ranks filter-first.
+PROFILES = {
+    "keyword_only": _profile(keywords=["spicy"]),
+    "course_cuisine": _profile(course="dinner", cuisine="pakistani", keywords=["chicken"], max_cook_time=45),
+    "ingredients": _profile(
+        cuisine="indian", selected_ingredients=["paneer", "spinach"], excluded_ingredients=["cream"], max_cook_time=30,
+    ),
+    "relaxed": _profile(course="dessert", selected_ingredients=["dragon fruit"], keywords=["crispy"]),
+    "broad": _profile(keywords=["easy", "quick", "healthy"], max_cook_time=60),
+    "narrow_filters": _profile(course="dessert", cuisine="pakistani", diet="vegan", keywords=["sweet"]),
+}
+
+
+def measure(fn, repeat):
+    """Run ``fn`` ``repeat`` times untraced, then once under tracemalloc."""
+    seconds = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds_min": min(seconds),
+        "seconds_median": statistics.median(seconds),
+        "peak_mb": peak / 2**20,
+    }
+
+
+def run_size(rows, work_dir, repeat):
+    csv_path = os.path.join(work_dir, f"synthetic_{rows}.csv")
+    if not os.path.exists(csv_path):
+        write_catalog(csv_path, rows)
+
+    report = {"rows": rows, "csv_mb": os.path.getsize(csv_path) / 2**20, "stages": {}}
+    stages = report["stages"]
+    snapshot_dir = os.path.join(work_dir, f"snapshots_{rows}")
+
+    def cold_bundle():
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        return load_catalog_bundle(csv_path, cache_dir=snapshot_dir)
+
+    stages["parse_csv"] = measure(lambda: load_food_dataset(csv_path, use_snapshot=False), repeat)
+    stages["bundle_cold"] = measure(cold_bundle, 1)
+    stages["bundle_warm"] = measure(lambda: load_catalog_bundle(csv_path, cache_dir=snapshot_dir), repeat)
+
+    bundle = load_catalog_bundle(csv_path, cache_dir=snapshot_dir)
+    df = bundle.df
+    report["catalog_rows"] = len(df)
+    documents = build_recipe_documents(df)
+    stages["ranker_fit"] = measure(lambda: SemanticRanker(documents), 1)
+    stages["index_build"] = measure(lambda: CatalogIndex(df, bundle.ingredients), repeat)
+
+    for name, prefs in PROFILES.items():
+        query = build_query_from_prefs(prefs)
+        stages[f"rank/{name}"] = measure(lambda: bundle.ranker.rank(query, top_k=100), repeat)
+
+        stages[f"recommend/{name}"] = measure(
+            lambda: recommend_foods(df, deepcopy(prefs), bundle.ranker, catalog_index=bundle.index),
+            repeat,
+        )
+
+        cache = RankedResultCache()
+        cache.bind(bundle.version)
+        recommend_foods(df, deepcopy(prefs), bundle.ranker, catalog_index=bundle.index, cache=cache)
+        next_page = {**deepcopy(prefs), "offset": 5}
+        stages[f"recommend_next_page/{name}"] = measure(
+            lambda: recommend_foods(df, next_page, bundle.ranker, catalog_index=bundle.index, cache=cache),
+            repeat,
+        )
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--work-dir", help="where generated CSVs and snapshots are kept (default: a temp dir)")
+    parser.add_argument("--out", help="JSON report path (default: stdout)")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="food-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+
+    results = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "profiles": PROFILES,
+        "runs": [],
+    }
+    for rows in args.sizes:
+        results["runs"].append(run_size(rows, work_dir, args.repeat))
+        print(f"{rows:>9,} rows done", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
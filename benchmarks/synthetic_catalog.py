@@ -0,0 +1,114 @@
+"""Synthetic recipe catalogs in the foods_data.csv schema.
+
+    python -m benchmarks.synthetic_catalog --rows 100000 --out /tmp/foods_100k.csv
+
+``Times``, ``nutritions`` and ``ingredients`` are written as Python
+literal strings, exactly like the real dataset, so the loader does the
+same parsing work. Output is deterministic for a given seed.
+"""
+
+import argparse
+import csv
+import random
+
+CUISINES = [
+    "pakistani", "indian", "north indian", "punjabi", "italian", "chinese", "indo-chinese",
+    "thai", "mexican", "american", "british", "french", "middle eastern", "arabic",
+    "afghan", "hyderabadi", "bohra cuisine", "world", "jamaican", "irish",
+]
+COURSES = [
+    "dinner recipes", "main course", "breakfast", "snack", "dessert", "appetizer",
+    "soup", "side dish", "drinks", "starter", "condiment", "sauce", "energy snack",
+]
+PROTEINS = ["chicken", "beef", "lamb", "fish", "prawns", "egg", "paneer", "chickpeas", "lentils", "tofu"]
+DISHES = ["curry", "karahi", "biryani", "pasta", "stir fry", "salad", "soup", "kebab", "pulao", "wrap", "cake", "pudding"]
+ADJECTIVES = ["spicy", "creamy", "quick", "easy", "smoky", "crispy", "tangy", "classic", "healthy", "homestyle"]
+PANTRY = [
+    "salt", "oil", "onion", "tomato", "garlic", "ginger", "cumin seeds", "coriander powder",
+    "turmeric", "red chili powder", "garam masala", "green chilies", "lemon juice", "yogurt",
+    "butter", "cream", "sugar", "flour", "milk", "rice", "black pepper", "cilantro",
+    "soy sauce", "vinegar", "honey", "cardamom", "cinnamon", "saffron", "potato", "spinach",
+]
+SUMMARY_TEMPLATES = [
+    "Authentic {name} recipe with easy {adj} flavours. Ready in {minutes} minutes and perfect for {course}.",
+    "This {cuisine} {dish} is {adj}, comforting and made with {protein}. A family favourite.",
+    "Easy {adj} {name} that you can prepare in one pot. Serve with naan or rice.",
+]
+
+
+def _duration(minutes: int) -> str:
+    if minutes >= 60 and minutes % 60 == 0:
+        hours = minutes // 60
+        return f"{hours} hour" if hours == 1 else f"{hours} hours"
+    return f"{minutes} minutes"
+
+
+def synthetic_rows(rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(rows):
+        cuisine_tags = rng.sample(CUISINES, rng.choice([1, 1, 2, 3]))
+        course_tags = rng.sample(COURSES, rng.choice([1, 1, 2]))
+        protein = rng.choice(PROTEINS)
+        dish = rng.choice(DISHES)
+        adj = rng.choice(ADJECTIVES)
+        name = f"{adj.title()} {protein.title()} {dish.title()} {i}"
+
+        prep = rng.choice([5, 10, 15, 20, 30])
+        cook = rng.choice([10, 15, 20, 30, 45, 60, 90, 120])
+        times = {"PrepTime": _duration(prep), "CookTime": _duration(cook)}
+        if rng.random() < 0.2:
+            times["RestingTime"] = _duration(rng.choice([10, 30, 60]))
+
+        ingredients = [protein] + rng.sample(PANTRY, rng.randint(6, 18))
+        # The real data has stray whitespace and mixed case in ingredient names
+        ingredients = [f" {item.title()} " if rng.random() < 0.1 else item for item in ingredients]
+
+        nutrition = {
+            "Calories": f"{rng.randint(80, 900)} kcal",
+            "Carbohydrates": f"{rng.randint(1, 120)} g",
+            "Protein": f"{rng.randint(1, 60)} g",
+            "Fat": f"{rng.randint(1, 60)} g",
+            "Saturated Fat": f"{rng.randint(0, 20)} g",
+            "Sodium": f"{rng.randint(10, 1500)} mg",
+            "Fiber": f"{rng.randint(0, 15)} g",
+            "Sugar": f"{rng.randint(0, 60)} g",
+        }
+
+        summary = rng.choice(SUMMARY_TEMPLATES).format(
+            name=name, adj=adj, minutes=prep + cook, course=course_tags[0],
+            cuisine=cuisine_tags[0], dish=dish, protein=protein,
+        )
+
+        yield {
+            "imgurl": f"https://example.com/images/recipe-{i}.jpg",
+            "name": name,
+            "course": ", ".join(t.title() for t in course_tags),
+            "cuisine": ", ".join(t.title() for t in cuisine_tags),
+            "keyword": f"{protein} {dish}, {adj} {dish}",
+            "summary": summary,
+            "ingredients": repr(ingredients),
+            "nutritions": repr(nutrition),
+            "Times": repr(times),
+        }
+
+
+def write_catalog(path: str, rows: int, seed: int = 0) -> str:
+    fields = ["imgurl", "name", "course", "cuisine", "keyword", "summary", "ingredients", "nutritions", "Times"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(synthetic_rows(rows, seed))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_catalog(args.out, args.rows, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Headless HTTP API for the recommendation chatbot.
+
+    python server.py --port 8080 --workers 4
+
+POST /chat    {"message": "...", "session_id": "...", "state": {...}}
+              -> {"session_id": "...", "reply": {...}, "state": {...}}
+POST /catalog {"upsert": [{...recipe...}], "delete": ["<food_id>", ...]}
+              -> {"catalog_version": "..."}   (needs CATALOG_ADMIN_TOKEN)
+GET  /thumbnails/{food_id}   small WebP of a recipe's image (cached on disk)
+GET  /healthz
+GET  /metrics   per-stage latency and candidate histograms (Prometheus text)
+GET  /traces    stage timings of this worker's recent turns (JSON)
+
+Clients either send the session state back with every request (stateless,
+works behind any load balancer) or just a ``session_id`` and let this
+process keep the state, which then needs sticky routing. Each worker
+process loads one catalog bundle and shares it across all its sessions.
+Catalog edits are written to a journal next to the CSV that every worker
+replays in the background (see ``services.live_catalog``), so they reach
+all workers within a few seconds, without a restart.
+"""
+
+import argparse
+import asyncio
+import hmac
+import multiprocessing
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+from aiohttp import web
+
+from services.chat_pipeline import ChatPipeline, new_session_state, validate_session_state
+from services.live_catalog import LiveCatalog, delete_entries, upsert_entries
+from services.llm_cache import DEFAULT_CACHE_PATH, ExtractionCache
+from services.llm_client import AsyncExtractionClient
+from services.llm_extractor import cache_namespace
+from services.result_cache import RankedResultCache
+from services.rule_extractor import CatalogRules
+from services.thumbnails import ThumbnailCache
+from services.tracing import tracer
+
+DATA_PATH = "data/foods_data.csv"
+
+
+class SessionStore:
+    """Server-side session states, bounded by count and idle time."""
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+
+    def get(self, session_id: str) -> dict:
+        entry = self._sessions.pop(session_id, None)
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            return new_session_state()
+        return entry[1]
+
+    def put(self, session_id: str, state: dict):
+        self._sessions[session_id] = (time.monotonic(), state)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+def build_pipeline(data_path: str = DATA_PATH) -> ChatPipeline:
+    catalog = LiveCatalog.open(data_path)
+    catalog.start()
+    client = AsyncExtractionClient(
+        cache=ExtractionCache(DEFAULT_CACHE_PATH, namespace=cache_namespace()),
+        rules=CatalogRules(catalog),
+    )
+    return ChatPipeline(catalog, client, result_cache=RankedResultCache())
+
+
+async def chat(request: web.Request) -> web.Response:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="Request body must be JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="Request body must be a JSON object")
+
+    message = body.get("message")
+    if not isinstance(message, str) or not message.strip():
+        raise web.HTTPBadRequest(text="'message' must be a non-empty string")
+
+    session_id = body.get("session_id") or uuid.uuid4().hex
+    if not isinstance(session_id, str):
+        raise web.HTTPBadRequest(text="'session_id' must be a string")
+
+    sessions = request.app["sessions"]
+    stateless = body.get("state") is not None
+    if stateless:
+        try:
+            state = validate_session_state(body["state"])
+        except ValueError as exc:
+            raise web.HTTPBadRequest(text=f"Invalid state: {exc}")
+    else:
+        state = sessions.get(session_id)
+
+    pipeline = request.app["pipeline"]
+    reply = await pipeline.ahandle(message, state)
+    if "recipes" in reply:
+        reply["recipes"] = pipeline.cards(reply["recipes"])
+
+    if not stateless:
+        sessions.put(session_id, state)
+    return web.json_response({"session_id": session_id, "reply": reply, "state": state})
+
+
+async def update_catalog(request: web.Request) -> web.Response:
+    token = os.getenv("CATALOG_ADMIN_TOKEN")
+    if not token:
+        raise web.HTTPNotFound()
+    given = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(given.encode(), token.encode()):
+        raise web.HTTPUnauthorized(text="Invalid catalog token")
+
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="Request body must be JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="Request body must be a JSON object")
+    upserts = body.get("upsert") or []
+    deletes = body.get("delete") or []
+    if not isinstance(upserts, list) or not isinstance(deletes, list):
+        raise web.HTTPBadRequest(text="'upsert' and 'delete' must be lists")
+    if not all(isinstance(record, dict) for record in upserts):
+        raise web.HTTPBadRequest(text="'upsert' entries must be recipe objects")
+
+    try:
+        entries = upsert_entries(upserts) + delete_entries(deletes)
+    except (TypeError, ValueError, OverflowError) as exc:
+        raise web.HTTPBadRequest(text=f"Invalid catalog update: {exc}")
+    version = await asyncio.to_thread(request.app["pipeline"].catalog.submit, entries)
+    return web.json_response({"catalog_version": version})
+
+
+async def healthz(request: web.Request) -> web.Response:
+    catalog = request.app["pipeline"].bundle
+    deleted = catalog.index.deleted
+    return web.json_response({
+        "status": "ok",
+        "catalog_version": catalog.version,
+        "recipes": len(catalog.df) - (0 if deleted is None else int(deleted.sum())),
+    })
+
+
+async def thumbnail(request: web.Request) -> web.Response:
+    try:
+        food_id = int(request.match_info["food_id"])
+    except ValueError:
+        raise web.HTTPNotFound()
+    if not 0 <= food_id < 2**64:
+        raise web.HTTPNotFound()
+    catalog = request.app["pipeline"].bundle
+    position = catalog.index.positions_of([food_id])[0]
+    if position < 0:
+        raise web.HTTPNotFound()
+    url = catalog.df["imgurl"].iloc[position]
+
+    cache = request.app["thumbnails"]
+    path = cache.cached(food_id, url)
+    if path is None:
+        path = await asyncio.to_thread(cache.get, food_id, url)
+        if path is None:
+            # Unreachable or not an image: let the client load the original
+            raise web.HTTPFound(url)
+    return web.FileResponse(path, headers={
+        "Content-Type": f"image/{cache.image_format}",
+        "Cache-Control": "public, max-age=86400",
+    })
+
+
+async def metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        text=tracer.render_prometheus(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+async def traces(request: web.Request) -> web.Response:
+    return web.json_response(list(tracer.recent))
+
+
+def make_app(data_path: str = DATA_PATH) -> web.Application:
+    app = web.Application()
+    app["pipeline"] = build_pipeline(data_path)
+    app["sessions"] = SessionStore()
+    app["thumbnails"] = ThumbnailCache()
+    app.router.add_post("/chat", chat)
+    app.router.add_post("/catalog", update_catalog)
+    app.router.add_get("/thumbnails/{food_id}", thumbnail)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_get("/traces", traces)
+    return app
+
+
+def serve(host: str, port: int, data_path: str, reuse_port: bool):
+    load_dotenv()
+    web.run_app(make_app(data_path), host=host, port=port, reuse_port=reuse_port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Food recommendation chat API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--data", default=DATA_PATH)
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        serve(args.host, args.port, args.data, reuse_port=False)
+        return
+
+    # Workers share the port via SO_REUSEPORT; the kernel balances connections
+    workers = [
+        multiprocessing.Process(target=serve, args=(args.host, args.port, args.data, True))
+        for _ in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+from html import escape
+
+from services.chat_pipeline import recipe_cards
+
+MAX_INGREDIENTS = 10
+# Card fragments kept in memory, shared by every session
+FRAGMENT_CACHE_SIZE = 4096
+CELL = 'style="padding: 8px; border: 1px solid #dee2e6;"'
+NUTRITION_FIELDS = ("Calories", "Protein", "Carbs", "Fat")
+
+
+class CardFragments:
+    """Rendered cards by (catalog version, ``food_id``), shared across sessions.
+
+    Messages only keep recipe ids, so every rerun asks for the cards of
+    the visible messages; a hit is a dict lookup, and misses are resolved
+    against the catalog in one batch. Least recently used fragments are
+    dropped past ``maxsize``.
+    """
+
+    def __init__(self, maxsize: int = FRAGMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, catalog, food_ids) -> list:
+        """A fragment per id, or None for recipes no longer in the catalog."""
+        keys = [(catalog.version, str(food_id)) for food_id in food_ids]
+        with self._lock:
+            found = {key: self._fragments.get(key) for key in keys}
+            for key, fragment in found.items():
+                if fragment is not None:
+                    self._fragments.move_to_end(key)
+
+        misses = [food_id for (_, food_id), fragment in found.items() if fragment is None]
+        if misses:
+            built = {
+                (catalog.version, card["food_id"]): card_fragment(card)
+                for card in recipe_cards(catalog, [{"food_id": food_id} for food_id in misses])
+            }
+            found.update(built)
+            with self._lock:
+                self._fragments.update(built)
+                while len(self._fragments) > self.maxsize:
+                    self._fragments.popitem(last=False)
+        return [found[key] for key in keys]
+
+
+def card_fragment(recipe: dict) -> dict:
+    """A recipe card as ready-to-render strings.
+
+    ``body`` is plain markdown, to be rendered without raw HTML, since its
+    text comes from catalog rows. ``nutrition`` is the only HTML part, with
+    every value escaped, or "" when the recipe has no nutrition facts. A
+    rerun hands these stored strings to ``st.markdown`` instead of
+    reformatting every card.
+    """
+    parts = [f"**{recipe['name'].title()}**"]
+
+    # Cuisine and course tags
+    tags = " | ".join(filter(None, [(recipe.get(f) or "").title() for f in ("cuisine", "course")]))
+    if tags:
+        parts.append(f":gray[{tags}]")
+    parts.append(f"⏱️ {recipe['total_time_minutes']} minutes")
+    parts.append(recipe["summary"])
+
+    ingredients = recipe.get("ingredients") or []
+    if ingredients:
+        text = ", ".join(ing.title() for ing in ingredients[:MAX_INGREDIENTS])
+        if len(ingredients) > MAX_INGREDIENTS:
+            text += f" *and {len(ingredients) - MAX_INGREDIENTS} more...*"
+        parts.append(f"**Ingredients**\n\n{text}")
+
+    nutrition = ""
+    if recipe.get("nutrition"):
+        nutrition = f"**Nutrition Facts**\n\n{nutrition_table(recipe['nutrition'])}"
+
+    return {
+        "food_id": recipe["food_id"],
+        "image": recipe["imgurl"],
+        "name": recipe["name"].title(),
+        "body": "\n\n".join(parts),
+        "nutrition": nutrition,
+    }
+
+
+def nutrition_table(nutrition: dict) -> str:
+    header = "".join(f"<td {CELL}><strong>{escape(field)}</strong></td>" for field in NUTRITION_FIELDS)
+    values = "".join(f"<td {CELL}>{escape(str(nutrition[field]))}</td>" for field in NUTRITION_FIELDS)
+    return (
+        '<table style="width:100%; border-collapse: collapse; font-size: 14px;">'
+        f'<tr style="background-color: #f8f9fa;">{header}</tr><tr>{values}</tr></table>'
+    )
+
+
+def message_summary(message: dict, names=()) -> str:
+    """One markdown line standing in for a message in the collapsed history."""
+    speaker = "You" if message["role"] == "user" else "Assistant"
+    text = " ".join(line.lstrip("#").strip() for line in message["content"].splitlines() if line.strip())
+    if names:
+        text += " " + ", ".join(f"**{name}**" for name in names)
+    return f"- **{speaker}:** {text}"
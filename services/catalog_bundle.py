@@ -0,0 +1,72 @@
+import os
+from dataclasses import dataclass
+
+import pandas as pd
+
+from services.catalog_index import CatalogIndex
+from services.catalog_store import StringLists, snapshot_path, source_digest
+from services.data_loader import build_recipe_documents, load_catalog_tables
+from services.dense_ranker import DenseRanker
+from services.semantic_ranker import SemanticRanker
+
+# Ranker backends by name; each keeps its fitted model in a directory of
+# that name inside the catalog snapshot
+RANKERS = {"tfidf": SemanticRanker, "lsa": DenseRanker}
+DEFAULT_RANKER = os.getenv("RANKER_BACKEND", "tfidf")
+
+
+@dataclass(frozen=True)
+class CatalogBundle:
+    """The catalog frame plus everything derived from it, for one data version.
+
+    ``version`` is the sha256 of the source CSV, so anything cached against
+    a bundle (ranked results, indexes) can tell when the data changed.
+    ``ingredients`` holds each row's ingredient list by row position.
+    """
+
+    df: pd.DataFrame
+    ranker: SemanticRanker | DenseRanker
+    index: CatalogIndex
+    version: str
+    ingredients: StringLists
+
+
+def load_catalog_bundle(path: str, cache_dir: str | None = None, backend: str | None = None) -> CatalogBundle:
+    """Parse (or memory-map) the catalog once and load or fit the ranker.
+
+    ``backend`` picks a ranker from ``RANKERS`` (default: the
+    ``RANKER_BACKEND`` environment variable, else TF-IDF). The fitted model
+    lives next to the catalog snapshot, inside the directory keyed by the
+    CSV hash, so it is invalidated together with it.
+    """
+    backend = backend or DEFAULT_RANKER
+    if backend not in RANKERS:
+        raise ValueError(f"Unknown ranker backend {backend!r}; expected one of {sorted(RANKERS)}")
+    ranker_cls = RANKERS[backend]
+
+    version = source_digest(path)
+    df, ingredients = load_catalog_tables(path, cache_dir=cache_dir)
+
+    ranker_dir = os.path.join(snapshot_path(path, version, cache_dir), backend)
+    ranker = None
+    if os.path.isdir(ranker_dir):
+        try:
+            ranker = ranker_cls.load(ranker_dir)
+        except (OSError, ValueError):
+            ranker = None
+
+    if ranker is None or ranker.n_docs != len(df):
+        ranker = ranker_cls(build_recipe_documents(df))
+        if os.path.isdir(os.path.dirname(ranker_dir)):
+            try:
+                ranker.save(ranker_dir)
+            except OSError:
+                pass
+
+    return CatalogBundle(
+        df=df,
+        ranker=ranker,
+        index=CatalogIndex(df, ingredients),
+        version=version,
+        ingredients=ingredients,
+    )
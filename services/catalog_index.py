@@ -0,0 +1,371 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from services.catalog_store import StringLists
+from services.diets import DIET_RULES, normalize_diet, violates
+
+TAG_COLUMNS = ("course", "cuisine")
+TEXT_COLUMNS = ("name", "summary", "keyword", "ingredients_text")
+# has_keyword searches the space-joined concatenation of these columns
+SEARCHABLE = "searchable"
+MASK_CACHE_SIZE = 1024
+
+
+class CatalogIndex:
+    """Row-position index over the loaded catalog, built once at load time.
+
+    Course and cuisine values repeat heavily, so each column is used as
+    integer codes plus its distinct values (the categorical codes of a
+    compact frame). A filter term is resolved against the distinct values
+    (substring match, same as the old ``str.contains`` scan) and turned
+    into a boolean bitmap over row positions, which is cached per term.
+    Tag postings are likewise derived once per distinct value.
+
+    Free-text columns are kept as object arrays for ``scan_candidates``
+    (``services.term_matcher``), which matches a query's terms against the
+    candidates in one pass. The ingredient lists get a ``TermMatrix`` keyed
+    by whole ingredient items, so membership questions for a set of
+    candidate positions never touch the row strings. ``ingredients`` is the
+    ``StringLists`` returned by ``load_catalog_tables``; frames that still
+    carry an ``ingredients_list`` column can omit it.
+
+    Excluded ingredients and diets are bitmaps too: each diet's bitmap
+    marks the rows with an ingredient item the diet rules out, classified
+    once from the ingredient vocabulary, so ``blocked_mask`` is a cached OR
+    of bitmaps however many exclusions a user adds.
+
+    ``positions_of`` maps ``food_id``s back to row positions, so callers
+    can keep ids instead of copies of rows.
+    """
+
+    def __init__(self, df: pd.DataFrame, ingredients: StringLists | None = None):
+        self.size = len(df)
+        self.food_ids = df["food_id"].to_numpy(dtype=np.uint64)
+        self._codes = {}
+        self._values = {}
+        self.postings = {}
+
+        for col in TAG_COLUMNS:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                codes, uniques = df[col].cat.codes.to_numpy(), df[col].cat.categories
+            else:
+                codes, uniques = pd.factorize(df[col].fillna("").astype(str))
+            codes = codes.astype(np.int32)
+            self._codes[col] = codes
+            self._values[col] = [str(v) for v in uniques]
+            self.postings[col] = tag_postings(codes, self._values[col])
+
+        self._mask_cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._texts = {
+            col: df[col].to_numpy(dtype=object) for col in TEXT_COLUMNS
+        }
+        if ingredients is None:
+            ingredients = StringLists.from_lists(df["ingredients_list"])
+        self.ingredients = TermMatrix.from_string_lists(ingredients)
+
+        vocab = self.ingredients.vocab
+        self.diets = {
+            diet: self._bitmap(
+                self.ingredients.postings(i) for i, item in enumerate(vocab) if violates(item, diet)
+            )
+            for diet in DIET_RULES
+        }
+        # Rows removed by catalog updates (see ``extend``), or None
+        self.deleted = None
+
+    def extend(self, df: pd.DataFrame, ingredients: StringLists, deleted: np.ndarray | None) -> "CatalogIndex":
+        """A new index with ``df``'s rows appended and ``deleted`` as tombstones.
+
+        Tag codes, text columns and diet bitmaps are extended rather
+        than rebuilt; this index is unchanged, so readers holding it keep a
+        consistent view. ``deleted`` covers the old and the new rows.
+        """
+        index = self._copy(deleted)
+        index.size = self.size + len(df)
+        index.food_ids = np.concatenate((self.food_ids, df["food_id"].to_numpy(dtype=np.uint64)))
+        for col in TAG_COLUMNS:
+            values = list(self._values[col])
+            codes = {value: code for code, value in enumerate(values)}
+            added = np.fromiter(
+                (codes.setdefault(v, len(codes)) for v in df[col].astype(object).fillna("").astype(str)),
+                dtype=np.int32, count=len(df),
+            )
+            values.extend(list(codes)[len(values):])
+            index._codes[col] = np.concatenate((self._codes[col], added))
+            index._values[col] = values
+            index.postings[col] = tag_postings(index._codes[col], values)
+
+        for col in TEXT_COLUMNS:
+            texts = df[col].to_numpy(dtype=object)
+            index._texts[col] = np.concatenate((self._texts[col], texts))
+        rows = ingredients.take(range(len(ingredients)))
+        index.ingredients = self.ingredients.extend(rows, self.size)
+        index.diets = {
+            diet: np.concatenate((
+                bitmap,
+                np.fromiter((any(violates(item, diet) for item in items) for items in rows), dtype=bool, count=len(rows)),
+            ))
+            for diet, bitmap in self.diets.items()
+        }
+        return index
+
+    def with_deleted(self, deleted: np.ndarray | None) -> "CatalogIndex":
+        """This index over the same rows with other tombstones."""
+        return self._copy(deleted)
+
+    def _copy(self, deleted) -> "CatalogIndex":
+        # Shares every array (none is modified in place); caches start empty
+        index = CatalogIndex.__new__(CatalogIndex)
+        index.__dict__.update(self.__dict__)
+        index._codes, index._values, index.postings = dict(self._codes), dict(self._values), dict(self.postings)
+        index._texts = dict(self._texts)
+        index._mask_cache = OrderedDict()
+        index._lock = threading.Lock()
+        index.deleted = deleted
+        return index
+
+    def _cached(self, key, build) -> np.ndarray:
+        with self._lock:
+            cached = self._mask_cache.get(key)
+            if cached is not None:
+                self._mask_cache.move_to_end(key)
+                return cached
+
+        result = build()
+        result.flags.writeable = False
+
+        with self._lock:
+            self._mask_cache[key] = result
+            if len(self._mask_cache) > MASK_CACHE_SIZE:
+                self._mask_cache.popitem(last=False)
+        return result
+
+    def _bitmap(self, row_lists) -> np.ndarray:
+        result = np.zeros(self.size, dtype=bool)
+        for rows in row_lists:
+            result[rows] = True
+        return result
+
+    def positions_of(self, food_ids) -> np.ndarray:
+        """Row position of each ``food_id``, or -1 if it is unknown or deleted.
+
+        An updated recipe maps to its newest row.
+        """
+        order = self._cached(("food_id_order",), lambda: np.argsort(self.food_ids, kind="stable"))
+        sorted_ids = self._cached(("food_id_sorted",), lambda: self.food_ids[order])
+        wanted = np.asarray([int(i) for i in food_ids], dtype=np.uint64)
+        if len(order) == 0:
+            return np.full(len(wanted), -1, dtype=np.int64)
+        # Stable order keeps duplicates by position: the right end is the newest
+        found = np.searchsorted(sorted_ids, wanted, side="right") - 1
+        positions = order[np.maximum(found, 0)].astype(np.int64)
+        missing = (found < 0) | (self.food_ids[positions] != wanted)
+        if self.deleted is not None:
+            missing |= self.deleted[positions]
+        positions[missing] = -1
+        return positions
+
+    def mask(self, column: str, term: str) -> np.ndarray:
+        """Boolean bitmap of rows whose ``column`` contains ``term``."""
+        needle = term.lower().strip()
+
+        def build():
+            matching = [
+                code for code, value in enumerate(self._values[column])
+                if needle in value
+            ]
+            return np.isin(self._codes[column], matching)
+
+        return self._cached((column, needle), build)
+
+    def blocked_mask(self, excluded, diet=None) -> np.ndarray | None:
+        """Bitmap of rows ruled out by ``excluded`` ingredients or ``diet``.
+
+        An excluded ingredient blocks every row with an ingredient item
+        containing it ("chicken" blocks "boneless chicken"). Deleted rows
+        are always blocked. Returns None when nothing is blocked.
+        """
+        items = tuple(sorted({i.lower().strip() for i in excluded or [] if i and i.strip()}))
+        diet = normalize_diet(diet)
+        if not items and diet is None:
+            return self.deleted
+
+        def build():
+            blocked = self.diets[diet].copy() if diet else np.zeros(self.size, dtype=bool)
+            for item in items:
+                blocked[self.ingredients.rows_with_substring(item)] = True
+            if self.deleted is not None:
+                blocked |= self.deleted
+            return blocked
+
+        return self._cached(("blocked", items, diet), build)
+
+    def positions(self, column: str, term: str) -> np.ndarray:
+        return np.flatnonzero(self.mask(column, term))
+
+    def contains(self, column: str, term: str, positions: np.ndarray) -> np.ndarray:
+        """Per-candidate ``term in row[column]`` for the given row positions.
+
+        Text columns are checked row by row; the recommender matches all of
+        a query's terms at once with ``scan_candidates`` instead.
+        """
+        if column in TAG_COLUMNS:
+            return self.mask(column, term)[positions]
+        texts = self.texts(column, positions)
+        return np.fromiter((term in t for t in texts), dtype=bool, count=len(texts))
+
+    def has_ingredient(self, item: str, positions: np.ndarray) -> np.ndarray:
+        """Per-candidate ``item in`` the row's ingredient list."""
+        return self.ingredients.has(item, positions)
+
+    def texts(self, column: str, positions: np.ndarray) -> list:
+        if column == SEARCHABLE:
+            columns = [self._texts[col][positions] for col in TEXT_COLUMNS]
+            return [" ".join(parts) for parts in zip(*columns)]
+        return list(self._texts[column][positions])
+
+
+class TermMatrix:
+    """Sparse row x term presence matrix stored column-wise (CSC).
+
+    ``vocab`` holds the distinct terms, and the rows containing term ``i``
+    are ``rows[indptr[i]:indptr[i + 1]]``. A token never contains
+    whitespace, so a whitespace-free query is a substring of a row's text
+    exactly when it is a substring of one of that row's tokens.
+    """
+
+    def __init__(self, term_lists):
+        term_ids = {}
+        row_ids = []
+        col_ids = []
+        for pos, terms in enumerate(term_lists):
+            for term in set(terms):
+                col_ids.append(term_ids.setdefault(term, len(term_ids)))
+                row_ids.append(pos)
+
+        col_ids = np.asarray(col_ids, dtype=np.int64)
+        order = np.argsort(col_ids, kind="stable")
+        self._build(list(term_ids), np.asarray(row_ids, dtype=np.int32)[order], _indptr(col_ids, len(term_ids)))
+
+    @classmethod
+    def from_string_lists(cls, lists: StringLists) -> "TermMatrix":
+        """Transpose a CSR ``StringLists`` (duplicates dropped per row)."""
+        n_rows = max(len(lists), 1)
+        rows = np.repeat(np.arange(len(lists), dtype=np.int64), np.diff(lists.indptr))
+        # Sorting (term, row) keys gives CSC order with rows ascending per term
+        keys = np.unique(np.asarray(lists.ids, dtype=np.int64) * n_rows + rows)
+        matrix = cls.__new__(cls)
+        matrix._build(lists.vocab, (keys % n_rows).astype(np.int32), _indptr(keys // n_rows, len(lists.vocab)))
+        return matrix
+
+    def extend(self, term_lists, start: int) -> "TermMatrix":
+        """A new matrix with ``term_lists`` added as rows ``start``, ``start + 1``, ...
+
+        The added rows come after every existing one, so their postings go
+        at the end of each term's block and the existing postings are moved,
+        not re-sorted. This matrix is unchanged.
+        """
+        term_ids = dict(self.term_ids)
+        row_ids = []
+        col_ids = []
+        for pos, terms in enumerate(term_lists, start):
+            for term in dict.fromkeys(terms):
+                col_ids.append(term_ids.setdefault(term, len(term_ids)))
+                row_ids.append(pos)
+
+        col_ids = np.asarray(col_ids, dtype=np.int64)
+        order = np.argsort(col_ids, kind="stable")
+        col_ids, row_ids = col_ids[order], np.asarray(row_ids, dtype=np.int32)[order]
+
+        old_counts = np.zeros(len(term_ids), dtype=np.int64)
+        old_counts[:len(self.vocab)] = np.diff(self.indptr)
+        new_counts = np.bincount(col_ids, minlength=len(term_ids))
+        indptr = np.zeros(len(term_ids) + 1, dtype=np.int64)
+        np.cumsum(old_counts + new_counts, out=indptr[1:])
+        new_before = np.concatenate(([0], np.cumsum(new_counts)[:-1]))
+
+        rows = np.empty(indptr[-1], dtype=np.int32)
+        # Existing postings shift by the number of added postings of earlier terms
+        rows[np.arange(len(self.rows)) + np.repeat(new_before, old_counts)] = self.rows
+        rows[indptr[col_ids] + old_counts[col_ids] + np.arange(len(col_ids)) - new_before[col_ids]] = row_ids
+
+        matrix = TermMatrix.__new__(TermMatrix)
+        matrix._build(list(term_ids), rows, indptr)
+        return matrix
+
+    def _build(self, vocab: list, rows: np.ndarray, indptr: np.ndarray):
+        self.vocab = vocab
+        self.term_ids = {term: i for i, term in enumerate(vocab)}
+        self.rows = rows
+        self.indptr = indptr
+        self._substring_cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def postings(self, term_id: int) -> np.ndarray:
+        return self.rows[self.indptr[term_id]:self.indptr[term_id + 1]]
+
+    def rows_with_substring(self, needle: str) -> np.ndarray:
+        with self._lock:
+            cached = self._substring_cache.get(needle)
+            if cached is not None:
+                self._substring_cache.move_to_end(needle)
+                return cached
+
+        matched = [self.postings(i) for i, term in enumerate(self.vocab) if needle in term]
+        rows = np.unique(np.concatenate(matched)) if matched else self.rows[:0]
+
+        with self._lock:
+            self._substring_cache[needle] = rows
+            if len(self._substring_cache) > MASK_CACHE_SIZE:
+                self._substring_cache.popitem(last=False)
+        return rows
+
+    def contains(self, needle: str, positions: np.ndarray) -> np.ndarray:
+        return _member(self.rows_with_substring(needle), positions)
+
+    def has(self, term: str, positions: np.ndarray) -> np.ndarray:
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return np.zeros(len(positions), dtype=bool)
+        return _member(self.postings(term_id), positions)
+
+
+def _indptr(col_ids: np.ndarray, n_terms: int) -> np.ndarray:
+    """CSC column pointers from the column of every posting."""
+    indptr = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(np.bincount(col_ids, minlength=n_terms), out=indptr[1:])
+    return indptr
+
+
+def _member(sorted_rows: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Vectorized membership test of ``positions`` in a sorted posting list."""
+    if len(sorted_rows) == 0:
+        return np.zeros(len(positions), dtype=bool)
+    idx = np.searchsorted(sorted_rows, positions)
+    idx[idx == len(sorted_rows)] = 0
+    return sorted_rows[idx] == positions
+
+
+def tag_postings(codes: np.ndarray, values: list) -> dict:
+    """Map each normalized tag to the sorted row positions carrying it.
+
+    ``values`` are comma-separated tag strings and ``codes`` the per-row
+    index into them, so each distinct value is split only once.
+    """
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+    parts = {}
+    for code, value in enumerate(values):
+        for tag in value.split(","):
+            tag = tag.strip().lower()
+            if tag:
+                parts.setdefault(tag, []).append(order[bounds[code]:bounds[code + 1]])
+    return {
+        tag: np.sort(np.concatenate(rows)).astype(np.int32)
+        for tag, rows in parts.items()
+    }
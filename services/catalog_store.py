@@ -0,0 +1,312 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_VERSION = 2
+META_FILE = "meta.json"
+INDEX_COLUMN = "__index__"
+
+_digests = {}
+
+
+def source_digest(path: str) -> str:
+    """sha256 of the source file, used to key snapshots.
+
+    Memoized on (size, mtime) so the catalog and the ranker artifacts can
+    both ask for it without hashing the file twice.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _digests:
+        with open(path, "rb") as f:
+            _digests[key] = hashlib.file_digest(f, "sha256").hexdigest()
+    return _digests[key]
+
+
+def snapshot_path(path: str, digest: str, cache_dir: str | None = None) -> str:
+    cache_dir = cache_dir or os.path.join(os.path.dirname(path) or ".", ".catalog_cache")
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{stem}-{digest[:16]}")
+
+
+def is_fresh(directory: str, digest: str) -> bool:
+    try:
+        with open(os.path.join(directory, META_FILE)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get("version") == SNAPSHOT_VERSION and meta.get("source_sha256") == digest
+
+
+class StringLists:
+    """A list-of-strings column stored as CSR over an interned vocabulary.
+
+    Row ``i`` holds ``vocab[ids[j]]`` for ``j`` in ``indptr[i]:indptr[i + 1]``,
+    in the original order. Each distinct string exists once however many
+    rows use it, and per-row Python lists are only built for the rows a
+    caller asks for.
+    """
+
+    def __init__(self, vocab, ids: np.ndarray, indptr: np.ndarray):
+        self.vocab = list(vocab)
+        self.ids = ids
+        self.indptr = indptr
+
+    @classmethod
+    def from_lists(cls, lists) -> "StringLists":
+        vocab = {}
+        lengths = []
+        ids = []
+        for items in lists:
+            lengths.append(len(items))
+            ids.extend(vocab.setdefault(item, len(vocab)) for item in items)
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        return cls(vocab, np.asarray(ids, dtype=np.int32), indptr)
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def row(self, pos: int) -> list:
+        vocab = self.vocab
+        return [vocab[i] for i in self.ids[self.indptr[pos]:self.indptr[pos + 1]].tolist()]
+
+    def take(self, positions) -> list:
+        return [self.row(pos) for pos in positions]
+
+    def extend(self, lists) -> "StringLists":
+        """A new ``StringLists`` with ``lists`` appended; this one is unchanged."""
+        vocab = {item: i for i, item in enumerate(self.vocab)}
+        tail = StringLists.from_lists(lists)
+        remap = np.fromiter(
+            (vocab.setdefault(item, len(vocab)) for item in tail.vocab), dtype=np.int32, count=len(tail.vocab)
+        )
+        return StringLists(
+            vocab,
+            np.concatenate((self.ids, remap[tail.ids])),
+            np.concatenate((self.indptr, self.indptr[-1] + tail.indptr[1:])),
+        )
+
+    def subset(self, positions: np.ndarray) -> "StringLists":
+        """The rows at ``positions``, in that order, over the same vocabulary."""
+        starts = self.indptr[positions]
+        lengths = self.indptr[np.asarray(positions) + 1] - starts
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        # Position of every kept item in ``ids``: its row's start plus its offset
+        items = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return StringLists(self.vocab, np.asarray(self.ids)[items], indptr)
+
+
+class SnapshotWriter:
+    """Append-only columnar writer for a processed catalog.
+
+    Every column is a set of raw little-endian files next to ``meta.json``:
+    numeric columns are one flat array and string columns are a UTF-8
+    buffer plus character end-offsets. Categorical columns and
+    list-of-string columns are interned: int32 codes into a vocabulary
+    that is written once at commit, plus per-row end-offsets for lists.
+    Frames can be appended in chunks (each with its own categories);
+    nothing is visible to readers until ``commit`` renames the directory
+    into place.
+    """
+
+    def __init__(self, directory: str, digest: str):
+        self.directory = directory
+        self.digest = digest
+        parent = os.path.dirname(directory) or "."
+        os.makedirs(parent, exist_ok=True)
+        self._tmp = tempfile.mkdtemp(prefix=".snapshot-", dir=parent)
+        self._columns = None
+        self._rows = 0
+        self._chars = {}
+        self._items = {}
+        self._vocabs = {}
+
+    def append(self, df: pd.DataFrame):
+        if self._columns is None:
+            self._columns = {INDEX_COLUMN: _column_spec(df.index.to_series())}
+            self._columns.update({col: _column_spec(df[col]) for col in df.columns})
+        elif list(self._columns)[1:] != list(df.columns):
+            raise ValueError("Snapshot chunks must share the same columns")
+
+        self._write(INDEX_COLUMN, df.index.to_numpy())
+        for col in df.columns:
+            self._write(col, df[col])
+        self._rows += len(df)
+
+    def commit(self) -> str:
+        meta = {
+            "version": SNAPSHOT_VERSION,
+            "source_sha256": self.digest,
+            "rows": self._rows,
+            "columns": self._columns or {},
+        }
+        for col, vocab in self._vocabs.items():
+            self._write_strings(f"{col}.vocab", list(vocab))
+        with open(os.path.join(self._tmp, META_FILE), "w") as f:
+            json.dump(meta, f)
+        try:
+            os.rename(self._tmp, self.directory)
+        except OSError:
+            if is_fresh(self.directory, self.digest):
+                # Another process published the same snapshot first
+                shutil.rmtree(self._tmp, ignore_errors=True)
+            else:
+                # Left over from an older snapshot format: replace it
+                stale = tempfile.mkdtemp(prefix=".stale-", dir=os.path.dirname(self.directory) or ".")
+                os.rename(self.directory, os.path.join(stale, "old"))
+                os.rename(self._tmp, self.directory)
+                shutil.rmtree(stale, ignore_errors=True)
+        return self.directory
+
+    def abort(self):
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+    def _file(self, col: str, part: str):
+        return open(os.path.join(self._tmp, f"{col}.{part}"), "ab")
+
+    def _write(self, col: str, values):
+        kind = self._columns[col]["kind"]
+        if kind == "numeric":
+            dtype = self._columns[col]["dtype"]
+            with self._file(col, "data") as f:
+                f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+            return
+
+        if kind == "category":
+            # The trailing -1 keeps NaN (code -1) as NaN
+            lookup = np.append(self._intern(col, values.cat.categories), np.int32(-1))
+            with self._file(col, "codes") as f:
+                f.write(lookup[values.cat.codes.to_numpy()].astype(np.int32).tobytes())
+            return
+
+        if kind == "list":
+            lengths = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+            ends = self._items.get(col, 0) + np.cumsum(lengths)
+            self._items[col] = int(ends[-1]) if len(ends) else self._items.get(col, 0)
+            with self._file(col, "rows") as f:
+                f.write(ends.tobytes())
+            vocab = self._vocabs.setdefault(col, {})
+            ids = [vocab.setdefault(item, len(vocab)) for items in values for item in items]
+            with self._file(col, "ids") as f:
+                f.write(np.asarray(ids, dtype=np.int32).tobytes())
+            return
+
+        nulls = values.isna().to_numpy()
+        values = ["" if missing else v for v, missing in zip(values, nulls)]
+        with self._file(col, "null") as f:
+            f.write(nulls.astype(np.uint8).tobytes())
+        self._write_strings(col, values)
+
+    def _write_strings(self, name: str, values: list):
+        text = "".join(values)
+        lengths = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+        ends = self._chars.get(name, 0) + np.cumsum(lengths)
+        self._chars[name] = self._chars.get(name, 0) + len(text)
+        with self._file(name, "offsets") as f:
+            f.write(ends.tobytes())
+        with self._file(name, "utf8") as f:
+            f.write(text.encode("utf-8"))
+
+    def _intern(self, col: str, categories) -> np.ndarray:
+        """Map a chunk's categories to codes in the column-wide vocabulary."""
+        vocab = self._vocabs.setdefault(col, {})
+        return np.fromiter(
+            (vocab.setdefault(c, len(vocab)) for c in categories), dtype=np.int32, count=len(categories)
+        )
+
+
+def write_snapshot(df: pd.DataFrame, directory: str, digest: str) -> str:
+    writer = SnapshotWriter(directory, digest)
+    try:
+        writer.append(df)
+    except Exception:
+        writer.abort()
+        raise
+    return writer.commit()
+
+
+def prune_snapshots(directory: str):
+    """Remove snapshots of the same source that ``directory`` supersedes."""
+    parent, name = os.path.split(directory)
+    stem = name.rsplit("-", 1)[0]
+    for entry in os.listdir(parent):
+        if entry != name and entry.rsplit("-", 1)[0] == stem:
+            shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+
+
+def read_snapshot(directory: str) -> tuple[pd.DataFrame, dict]:
+    """Load a committed snapshot, memory-mapping the numeric columns.
+
+    List columns are returned separately as ``StringLists`` keyed by column
+    name, since a DataFrame could only hold them as per-row Python lists.
+
+    String columns are decoded into Python strings here rather than kept as
+    buffer plus offsets: ``CatalogIndex`` scans name, summary, keyword and
+    ingredients_text over the candidates of every query, so a lazy column
+    would decode the same rows again on each turn. Without pyarrow pandas
+    has no string dtype that could hold the buffer as it is.
+    """
+    with open(os.path.join(directory, META_FILE)) as f:
+        meta = json.load(f)
+    rows = meta["rows"]
+
+    columns = {}
+    lists = {}
+    for col, spec in meta["columns"].items():
+        kind = spec["kind"]
+        if kind == "numeric":
+            columns[col] = _map(directory, f"{col}.data", spec["dtype"], rows)
+        elif kind == "category":
+            codes = _map(directory, f"{col}.codes", np.int32, rows)
+            vocab = _vocab(directory, col)
+            columns[col] = pd.Categorical.from_codes(np.asarray(codes), categories=vocab)
+        elif kind == "list":
+            indptr = np.concatenate(([0], _map(directory, f"{col}.rows", np.int64, rows)))
+            ids = _map(directory, f"{col}.ids", np.int32, int(indptr[-1]))
+            lists[col] = StringLists(_vocab(directory, col), ids, indptr)
+        else:
+            values = _strings(directory, col, rows)
+            nulls = _map(directory, f"{col}.null", np.uint8, rows)
+            if nulls.any():
+                values = [None if missing else v for v, missing in zip(values, nulls)]
+            columns[col] = values
+
+    index = pd.Index(columns.pop(INDEX_COLUMN), dtype=meta["columns"][INDEX_COLUMN]["dtype"])
+    df = pd.DataFrame({col: pd.Series(values, index=index) for col, values in columns.items()}, index=index)
+    return df, lists
+
+
+def _column_spec(series: pd.Series) -> dict:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return {"kind": "category"}
+    if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        return {"kind": "numeric", "dtype": series.dtype.str}
+    first = next((v for v in series if isinstance(v, (list, str))), "")
+    return {"kind": "list" if isinstance(first, list) else "str"}
+
+
+def _map(directory: str, name: str, dtype, count: int) -> np.ndarray:
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(os.path.join(directory, name), dtype=dtype, mode="r", shape=(count,))
+
+
+def _strings(directory: str, name: str, count: int) -> list:
+    ends = _map(directory, f"{name}.offsets", np.int64, count)
+    with open(os.path.join(directory, f"{name}.utf8"), "rb") as f:
+        text = f.read().decode("utf-8")
+    starts = np.concatenate(([0], ends[:-1])).tolist()
+    return [text[a:b] for a, b in zip(starts, ends.tolist())]
+
+
+def _vocab(directory: str, col: str) -> list:
+    name = f"{col}.vocab"
+    size = os.path.getsize(os.path.join(directory, f"{name}.offsets")) // 8
+    return _strings(directory, name, size)
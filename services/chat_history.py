@@ -0,0 +1,86 @@
+import json
+import os
+import time
+import weakref
+from collections import deque
+
+# Messages kept whole; older ones are folded to one-line summaries
+RECENT_MESSAGES = 6
+# Folded summaries kept in memory
+MAX_FOLDED = 200
+# Spill files untouched for this long belong to sessions that are gone
+SPILL_MAX_AGE = 24 * 3600
+
+
+class ChatHistory:
+    """One session's chat messages, in bounded memory.
+
+    The last ``recent`` messages are kept whole. Older ones are folded to
+    the one-line summary given with them, and only the last
+    ``max_folded`` summaries are kept. With ``spill_path`` each message is
+    appended there as a JSON line when it is folded, so the whole
+    conversation can still be read back with ``spilled``. The file is
+    removed with the history: on ``clear``, and when the history is
+    garbage-collected because its session ended. ``prune_spills`` catches
+    files left by a process that did not exit cleanly.
+
+    Messages are expected to hold references (recipe ids), not catalog
+    data; see ``ChatPipeline``.
+    """
+
+    def __init__(self, recent: int = RECENT_MESSAGES, max_folded: int = MAX_FOLDED, spill_path: str | None = None):
+        self.recent = recent
+        self.spill_path = spill_path
+        self.messages = []
+        self.folded = deque(maxlen=max_folded)
+        self.folded_count = 0
+        self._summaries = []
+        if spill_path:
+            weakref.finalize(self, _remove, spill_path)
+
+    def append(self, message: dict, summary: str):
+        self.messages.append(message)
+        self._summaries.append(summary)
+        while len(self.messages) > self.recent:
+            oldest = self.messages.pop(0)
+            if self.spill_path:
+                with open(self.spill_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(oldest) + "\n")
+            self.folded.append(self._summaries.pop(0))
+            self.folded_count += 1
+
+    def spilled(self) -> list:
+        """The folded messages written to ``spill_path``, oldest first."""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return []
+        with open(self.spill_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def clear(self):
+        self.messages.clear()
+        self._summaries.clear()
+        self.folded.clear()
+        self.folded_count = 0
+        if self.spill_path:
+            _remove(self.spill_path)
+
+    def __len__(self) -> int:
+        return self.folded_count + len(self.messages)
+
+
+def prune_spills(directory: str, max_age: float = SPILL_MAX_AGE) -> int:
+    """Remove spill files in ``directory`` not written for ``max_age`` seconds."""
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".jsonl") and entry.is_file() and entry.stat().st_mtime < cutoff:
+            _remove(entry.path)
+            removed += 1
+    return removed
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
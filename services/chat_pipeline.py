@@ -0,0 +1,232 @@
+import asyncio
+from copy import deepcopy
+
+from services.conversation_guard import follow_up_question, missing_signals
+from services.conversation_policy import next_action
+from services.explanation_engine import explain_batch
+from services.llm_client import FallbackPreferences
+from services.llm_extractor import get_greeting_response, is_greeting
+from services.preference_utils import BASE_PREFERENCES, merge_preferences, normalize_course
+from services.recommender import recommend_foods
+from services.refinement_detector import detect_refinement
+from services.tracing import span, tracer
+
+RELAXED_MESSAGE = "I relaxed some constraints to find better matches.\n\n"
+CLOSEST_MESSAGE = "Couldn't find exact matches for all your criteria. Showing closest matches.\n\n"
+EMPTY_MESSAGE = "No recipes match your preferences. Try changing cuisine, time, or ingredients."
+WRAPPED_MESSAGE = "That's all the matching recipes, so here they are again from the top.\n\n"
+FALLBACK_MESSAGE = "Sorry, I couldn't understand that, so here are the results for your previous preferences.\n\n"
+RECOMMEND_HEADING = "### 🍽️ Here's what I recommend:"
+
+
+# Types a client-supplied session state may hold, per preference
+TEXT_PREFERENCES = ("course", "cuisine", "diet")
+LIST_PREFERENCES = ("keywords", "selected_ingredients", "excluded_ingredients", "skipped_fields")
+
+
+def new_session_state() -> dict:
+    return {
+        "preferences": deepcopy(BASE_PREFERENCES),
+    }
+
+
+def validate_session_state(state) -> dict:
+    """A complete session state from a client-supplied one, or ValueError.
+
+    Missing preferences take their defaults; anything ``handle`` could not
+    merge (unknown keys, wrong types) is rejected rather than failing
+    mid-turn.
+    """
+    if not isinstance(state, dict):
+        raise ValueError("'state' must be an object")
+    unknown = set(state) - {"preferences"}
+    if unknown:
+        raise ValueError(f"Unknown state keys: {sorted(unknown)}")
+    prefs = state.get("preferences", {})
+    if not isinstance(prefs, dict):
+        raise ValueError("'state.preferences' must be an object")
+    unknown = set(prefs) - set(BASE_PREFERENCES)
+    if unknown:
+        raise ValueError(f"Unknown preferences: {sorted(unknown)}")
+
+    for key in TEXT_PREFERENCES:
+        if prefs.get(key) is not None and not isinstance(prefs[key], str):
+            raise ValueError(f"'{key}' must be a string or null")
+    for key in LIST_PREFERENCES:
+        value = prefs.get(key, [])
+        if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+            raise ValueError(f"'{key}' must be a list of strings")
+    max_time = prefs.get("max_cook_time")
+    if max_time is not None and (isinstance(max_time, bool) or not isinstance(max_time, (int, float)) or max_time <= 0):
+        raise ValueError("'max_cook_time' must be a positive number or null")
+    offset = prefs.get("offset", 0)
+    if isinstance(offset, bool) or not isinstance(offset, int) or offset < 0:
+        raise ValueError("'offset' must be a non-negative integer")
+
+    return {"preferences": {**deepcopy(BASE_PREFERENCES), **prefs}}
+
+
+class ChatPipeline:
+    """One chat turn, from user message to assistant reply, without any UI.
+
+    Session state is a plain JSON-serializable dict (see
+    ``new_session_state``) that the caller owns: the Streamlit app keeps it
+    in ``st.session_state``, the HTTP server in its session store or in the
+    request itself. One pipeline (catalog, caches, LLM client) is shared by
+    every session in a process.
+
+    ``catalog`` is a ``CatalogBundle`` or a ``LiveCatalog``; a turn reads a
+    single bundle from start to finish even if an update lands meanwhile.
+    """
+
+    def __init__(self, catalog, extraction_client, result_cache=None):
+        self.catalog = catalog
+        self.extraction_client = extraction_client
+        self.result_cache = result_cache
+
+    @property
+    def bundle(self):
+        """The catalog bundle new turns use."""
+        return getattr(self.catalog, "current", self.catalog)
+
+    def handle(self, message: str, state: dict) -> dict:
+        """Run a turn synchronously; returns the assistant message dict."""
+        with tracer.turn(), span("turn"):
+            if is_greeting(message):
+                return self._greeting(state)
+            with span("extract"):
+                new_prefs = self.extraction_client.extract(message)
+            return self._respond(message, new_prefs, state)
+
+    async def ahandle(self, message: str, state: dict) -> dict:
+        with tracer.turn(), span("turn"):
+            if is_greeting(message):
+                return self._greeting(state)
+            with span("extract"):
+                new_prefs = await self.extraction_client.aextract(message)
+            return await asyncio.to_thread(self._respond, message, new_prefs, state)
+
+    def _greeting(self, state: dict) -> dict:
+        return {"role": "assistant", "content": get_greeting_response()}
+
+    def _respond(self, message: str, new_prefs: dict, state: dict) -> dict:
+        refinements = detect_refinement(message)
+        fallback = isinstance(new_prefs, FallbackPreferences)
+        new_prefs = {**new_prefs, **refinements}
+
+        if new_prefs.get("course"):
+            new_prefs["course"] = normalize_course(new_prefs["course"])
+
+        # Merge into session memory
+        state["preferences"] = merge_preferences(state["preferences"], new_prefs)
+
+        decision = next_action(state["preferences"])
+        if decision["type"] == "ask":
+            return {"role": "assistant", "content": decision["message"]}
+
+        missing = missing_signals(state["preferences"])
+        if missing:
+            return {"role": "assistant", "content": follow_up_question(missing)}
+
+        # Extraction timed out or failed: the preferences did not change
+        return self._recommend(state, FALLBACK_MESSAGE if fallback else "")
+
+    def _recommend(self, state: dict, note: str = "") -> dict:
+        state["preferences"].setdefault("offset", 0)
+        catalog = self.bundle
+        with span("recommend"):
+            recs, relaxation = self._run(state["preferences"], catalog)
+
+        wrapped_message = ""
+        if recs.empty and state["preferences"]["offset"] > 0:
+            # Paged past the last match: start over rather than report none
+            state["preferences"]["offset"] = 0
+            with span("recommend"):
+                recs, relaxation = self._run(state["preferences"], catalog)
+            wrapped_message = WRAPPED_MESSAGE
+
+        if recs.empty:
+            return {"role": "assistant", "content": EMPTY_MESSAGE}
+
+        # The ranker already relaxed what it had to; say so
+        relaxed_message = note + wrapped_message
+        if relaxation.get("dropped"):
+            relaxed_message += RELAXED_MESSAGE
+        elif relaxation:
+            relaxed_message += CLOSEST_MESSAGE
+
+        preferences = state["preferences"]
+        # Only ids and per-turn data: display fields are resolved from the
+        # shared catalog when rendered (see ``recipe_cards``)
+        with span("explain"):
+            recipe_data = [
+                {"food_id": str(food_id), "explanation": explanation, "score": round(score, 4)}
+                for food_id, explanation, score in zip(
+                    recs["food_id"].tolist(), explain_batch(recs, preferences), recs["final_score"].tolist()
+                )
+            ]
+
+        time_note = ""
+        if preferences.get("max_cook_time"):
+            time_note = f"⏱️ Showing recipes around {preferences['max_cook_time']} minutes\n\n"
+
+        reply = {
+            "role": "assistant",
+            "content": relaxed_message + time_note + RECOMMEND_HEADING,
+            "recipes": recipe_data,
+        }
+        if relaxation:
+            reply["relaxation"] = relaxation
+        return reply
+
+    def cards(self, recipes: list) -> list:
+        """Display dicts for a reply's ``recipes`` (see ``recipe_cards``)."""
+        return recipe_cards(self.bundle, recipes)
+
+    def _run(self, preferences: dict, catalog):
+        if self.result_cache is not None:
+            self.result_cache.bind(catalog.version)
+        return recommend_foods(
+            catalog.df,
+            preferences,
+            catalog.ranker,
+            catalog_index=catalog.index,
+            cache=self.result_cache,
+        )
+
+
+def recipe_cards(catalog, recipes: list) -> list:
+    """Resolve recipe references (dicts with a ``food_id``) against ``catalog``.
+
+    Each result is the reference's own fields on top of ``recipe_card``.
+    References to recipes no longer in the catalog are skipped.
+    """
+    positions = catalog.index.positions_of([recipe["food_id"] for recipe in recipes])
+    found = positions >= 0
+    rows = catalog.df.iloc[positions[found]].to_dict("records")
+    ingredients = catalog.ingredients.take(positions[found])
+    recipes = [recipe for recipe, ok in zip(recipes, found) if ok]
+    return [
+        {**recipe_card(row, items), **recipe}
+        for row, items, recipe in zip(rows, ingredients, recipes)
+    ]
+
+
+def recipe_card(row, ingredients: list) -> dict:
+    """Display fields for one catalog row, as plain Python values."""
+    return {
+        "food_id": str(row["food_id"]),
+        "imgurl": row["imgurl"],
+        "name": row["name"],
+        "cuisine": row.get("cuisine", ""),
+        "course": row.get("course", ""),
+        "total_time_minutes": int(row["total_time_minutes"]),
+        "summary": row["summary"],
+        "ingredients": ingredients,
+        "nutrition": {
+            "Calories": f"{row.get('calories_kcal', 0):.0f} kcal",
+            "Protein": f"{row.get('protein_g', 0):.1f} g",
+            "Carbs": f"{row.get('carbs_g', 0):.1f} g",
+            "Fat": f"{row.get('fat_g', 0):.1f} g"
+        }
+    }
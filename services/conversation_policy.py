@@ -15,19 +15,6 @@ def next_action(preferences: dict) -> dict:
 
     return {"type": "recommend"}
 
-def relax_preferences(prefs):
-    relaxed = prefs.copy()
-
-    if relaxed.get("course"):
-        relaxed["course"] = None
-    elif relaxed.get("cuisine"):
-        relaxed["cuisine"] = None
-    elif relaxed.get("keywords"):
-        relaxed["keywords"] = []
-
-    return relaxed
-
-
 # def relax_preferences(prefs):
 #     relaxed = prefs.copy()
 
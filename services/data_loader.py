@@ -1,7 +1,23 @@
+import numpy as np
 import pandas as pd
 import hashlib
 import ast
+import itertools
+import multiprocessing
+import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from services.catalog_store import (
+    SnapshotWriter,
+    StringLists,
+    is_fresh,
+    prune_snapshots,
+    read_snapshot,
+    snapshot_path,
+    source_digest,
+)
 
 REQUIRED_COLUMNS = {
     "name",
@@ -15,9 +31,48 @@ REQUIRED_COLUMNS = {
     "Times"
 }
 
-def generate_food_id(row) -> str:
+NUTRITION_COLUMNS = ["calories_kcal", "protein_g", "carbs_g", "fat_g"]
+
+# Raw literal columns, dropped once parsed into the columns above
+RAW_COLUMNS = ["ingredients", "nutritions", "Times"]
+CATEGORY_COLUMNS = ["course", "cuisine"]
+
+# Rows per chunk when streaming a CSV into a snapshot
+DEFAULT_CHUNK_ROWS = 50_000
+
+# Processes used to prepare chunks; 1 keeps ingest in-process
+DEFAULT_WORKERS = int(os.getenv("CATALOG_WORKERS", os.cpu_count() or 1))
+
+# A quoted string with no escapes, line breaks or NULs: its value is the
+# text between the quotes
+_STRING = r"""'[^'\\\r\n\x00]*'|"[^"\\\r\n\x00]*\""""
+_SEP = r"[ \t]*"
+STRING_RE = re.compile(_STRING)
+LIST_LITERAL_RE = re.compile(rf"\[{_SEP}(?:(?:{_STRING}){_SEP}(?:,{_SEP}(?:{_STRING}){_SEP})*)?\]")
+DICT_LITERAL_RE = re.compile(
+    rf"\{{{_SEP}(?:(?:{_STRING}){_SEP}:{_SEP}(?:{_STRING}){_SEP}"
+    rf"(?:,{_SEP}(?:{_STRING}){_SEP}:{_SEP}(?:{_STRING}){_SEP})*)?\}}"
+)
+
+def parse_literal(text: str):
+    """``ast.literal_eval`` for the list/dict-of-strings literals in the dataset.
+
+    Literals made only of plain quoted strings are tokenized with a regex,
+    several times faster than compiling them; anything else (escapes,
+    numbers, nesting) goes through ``ast.literal_eval``, so the result and
+    any exception are the same either way.
+    """
+    if LIST_LITERAL_RE.fullmatch(text):
+        return [s[1:-1] for s in STRING_RE.findall(text)]
+    if DICT_LITERAL_RE.fullmatch(text):
+        values = [s[1:-1] for s in STRING_RE.findall(text)]
+        return dict(zip(values[::2], values[1::2]))
+    return ast.literal_eval(text)
+
+def generate_food_id(row) -> int:
+    """Stable 64-bit id: the first 8 bytes of the md5 of name, cuisine and course."""
     raw = f"{row['name']}_{row['cuisine']}_{row['course']}"
-    return hashlib.md5(raw.encode()).hexdigest()
+    return int.from_bytes(hashlib.md5(raw.encode()).digest()[:8], "big")
 
 def parse_time_to_minutes(time_str: str) -> int:
     if not isinstance(time_str, str):
@@ -34,7 +89,7 @@ def calculate_total_time(times_value) -> int:
     total_minutes = 0
     try:
         if isinstance(times_value, str):
-            times_dict = ast.literal_eval(times_value)
+            times_dict = parse_literal(times_value)
         elif isinstance(times_value, dict):
             times_dict = times_value
         else:
@@ -60,7 +115,7 @@ def parse_nutrition_dict(nutrition_value) -> dict:
     }
     try:
         if isinstance(nutrition_value, str):
-            nutrition_dict = ast.literal_eval(nutrition_value)
+            nutrition_dict = parse_literal(nutrition_value)
         elif isinstance(nutrition_value, dict):
             nutrition_dict = nutrition_value
         else:
@@ -82,7 +137,7 @@ def parse_nutrition_dict(nutrition_value) -> dict:
 def parse_ingredients(value) -> list:
     try:
         if isinstance(value, str):
-            items = ast.literal_eval(value)
+            items = parse_literal(value)
         elif isinstance(value, list):
             items = value
         else:
@@ -91,8 +146,125 @@ def parse_ingredients(value) -> list:
     except Exception:
         return []
 
-def load_food_dataset(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
+def read_catalog_csv(path: str, chunksize: int | None = None):
+    # Schema columns are always text; pinning the dtype keeps chunks from
+    # inferring different types for the same column
+    return pd.read_csv(path, dtype={col: str for col in REQUIRED_COLUMNS}, chunksize=chunksize)
+
+def load_food_dataset(
+    path: str,
+    use_snapshot: bool = True,
+    cache_dir: str | None = None,
+    chunksize: int = DEFAULT_CHUNK_ROWS,
+    workers: int = DEFAULT_WORKERS,
+) -> pd.DataFrame:
+    """The catalog frame for ``path``, without per-row ingredient lists.
+
+    See ``load_catalog_tables`` for the ingredient lists.
+    """
+    return load_catalog_tables(path, use_snapshot, cache_dir, chunksize, workers)[0]
+
+def load_catalog_tables(
+    path: str,
+    use_snapshot: bool = True,
+    cache_dir: str | None = None,
+    chunksize: int = DEFAULT_CHUNK_ROWS,
+    workers: int = DEFAULT_WORKERS,
+) -> tuple[pd.DataFrame, StringLists]:
+    """Load the processed catalog for ``path`` and its ingredient lists.
+
+    Parsing the CSV is expensive (three ``ast.literal_eval`` calls per row),
+    so the processed frame is kept as a binary snapshot keyed by the CSV's
+    sha256. A fresh snapshot is memory-mapped instead of reparsing; a stale
+    one is rebuilt with ``ingest_catalog``, ``chunksize`` rows at a time
+    across ``workers`` processes.
+
+    The frame is compact: course and cuisine are categoricals, ``food_id``
+    is a uint64 and the raw literal columns are dropped. Ingredient lists
+    are returned as ``StringLists`` (int32 ids into one vocabulary) rather
+    than a column of Python lists.
+    """
+    if not use_snapshot:
+        return compact_catalog(prepare_catalog(read_catalog_csv(path)))
+
+    digest = source_digest(path)
+    directory = snapshot_path(path, digest, cache_dir)
+    if not is_fresh(directory, digest):
+        try:
+            ingest_catalog(path, directory, digest, chunksize=chunksize, workers=workers)
+            prune_snapshots(directory)
+        except OSError:
+            # Read-only deployments still work, they just parse on every start
+            return compact_catalog(prepare_catalog(read_catalog_csv(path)))
+
+    df, lists = read_snapshot(directory)
+    return df, lists["ingredients_list"]
+
+def compact_catalog(df: pd.DataFrame) -> tuple[pd.DataFrame, StringLists]:
+    """Split a prepared frame into the compact frame and its ingredient lists."""
+    ingredients = StringLists.from_lists(df["ingredients_list"])
+    return df.drop(columns="ingredients_list"), ingredients
+
+def ingest_catalog(
+    path: str,
+    directory: str,
+    digest: str,
+    chunksize: int = DEFAULT_CHUNK_ROWS,
+    workers: int = DEFAULT_WORKERS,
+) -> str:
+    """Stream the CSV into a snapshot at ``directory``.
+
+    Each chunk is parsed and normalized on its own and appended to the
+    snapshot, so peak memory depends on ``chunksize`` rather than on the
+    size of the file. Every derived column is computed per row, so the
+    result is the same as preparing the whole frame at once.
+    """
+    writer = SnapshotWriter(directory, digest)
+    try:
+        written = empty = None
+        for chunk in _prepared_chunks(path, chunksize, workers):
+            # Column kinds come from the first appended chunk, so rows
+            # that were all filtered out must not go first
+            if len(chunk):
+                writer.append(chunk)
+                written = True
+            else:
+                empty = chunk
+        if not written and empty is not None:
+            writer.append(empty)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.commit()
+
+def _prepared_chunks(path: str, chunksize: int, workers: int):
+    """Yield ``prepare_catalog`` of each CSV chunk, in file order.
+
+    Files with more than one chunk are prepared in a process pool. Workers
+    are spawned rather than forked, so it is safe from threaded hosts like
+    Streamlit, but scripts calling this need the usual ``if __name__ ==
+    "__main__"`` guard. At most
+    ``workers + 1`` chunks are in flight, which keeps memory bounded while
+    the parent writes finished chunks.
+    """
+    chunks = iter(read_catalog_csv(path, chunksize=chunksize))
+    head = list(itertools.islice(chunks, 2))
+    if workers <= 1 or len(head) < 2:
+        for chunk in itertools.chain(head, chunks):
+            yield prepare_catalog(chunk)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for chunk in itertools.chain(head, chunks):
+            pending.append(pool.submit(prepare_catalog, chunk))
+            if len(pending) > workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def prepare_catalog(df: pd.DataFrame) -> pd.DataFrame:
     missing = REQUIRED_COLUMNS - set(df.columns)
     if missing:
         raise ValueError(f"Dataset missing columns: {missing}")
@@ -105,36 +277,41 @@ def load_food_dataset(path: str) -> pd.DataFrame:
     df.dropna(subset=["name", "course"], inplace=True)
     df = df[df["total_time_minutes"] > 0]
 
-    nutrition_df = df["nutritions"].apply(parse_nutrition_dict).apply(pd.Series)
+    nutrition_df = pd.DataFrame(
+        df["nutritions"].map(parse_nutrition_dict).tolist(),
+        index=df.index,
+        columns=NUTRITION_COLUMNS,
+        dtype=float,
+    )
     df = pd.concat([df, nutrition_df], axis=1)
 
     df["ingredients_list"] = df["ingredients"].apply(parse_ingredients)
     df["ingredients_text"] = df["ingredients_list"].apply(lambda x: ", ".join(x))
 
-    df["food_id"] = df.apply(generate_food_id, axis=1)
-
-    df["cuisine_tags"] = df["cuisine"].apply(parse_tags)
-    df["course_tags"] = df["course"].apply(parse_tags)
-
-    df["course_tags"] = df["course"].str.lower().str.split(",").apply(
-        lambda x: [t.strip() for t in x]
+    df["food_id"] = np.fromiter(
+        (
+            generate_food_id({"name": n, "cuisine": c, "course": co})
+            for n, c, co in zip(df["name"], df["cuisine"], df["course"])
+        ),
+        dtype=np.uint64,
+        count=len(df),
     )
 
-    return df
+    # Tags are derived per distinct value by CatalogIndex; the raw literals
+    # are not needed once parsed
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype("category")
+    return df.drop(columns=RAW_COLUMNS)
 
 def build_recipe_documents(df):
     return (
         df["name"] + " " +
         df["summary"] + " " +
         df["ingredients_text"] + " " +
-        df["cuisine"] + " " +
-        df["course"]
+        df["cuisine"].astype(str) + " " +
+        df["course"].astype(str)
     ).fillna("").tolist()
 
-def parse_tags(value: str) -> list:
-    if not isinstance(value, str):
-        return []
-    return [v.strip().lower() for v in value.split(",") if v.strip()]    
 
 # df = load_food_dataset("foods_data.csv")
 
@@ -0,0 +1,240 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from services.semantic_ranker import STOP_WORDS, candidate_rows, top_k_scores
+
+DENSE_DIMS = 128
+DEFAULT_NPROBE = 16
+# Documents per coarse cluster the list count is sized for
+LIST_SIZE = 1024
+# KMeans is fitted on at most this many documents per list
+TRAIN_PER_LIST = 64
+# The SVD basis is fitted on a sample of at most this many documents
+SVD_SAMPLE = 200_000
+# Documents projected per batch
+PROJECT_BATCH = 65_536
+
+
+class DenseRanker:
+    """LSA ranker: TF-IDF projected to a few dense dimensions, searched by IVF.
+
+    Documents are embedded with TruncatedSVD over the same TF-IDF features
+    as ``SemanticRanker`` and L2-normalized, so a dot product is the cosine
+    in the latent space, where paraphrases sharing no literal term can
+    still score. Vectors are float32, grouped by coarse KMeans cluster
+    (inverted lists) so a query scores the centroids, then only the
+    ``nprobe`` closest lists. ``nprobe >= n_lists`` is an exact search.
+
+    ``rank``/``rank_batch`` take the same arguments as ``SemanticRanker``.
+    """
+
+    def __init__(self, documents, dims=DENSE_DIMS, n_lists=None, nprobe=DEFAULT_NPROBE, seed=0):
+        self.vectorizer = TfidfVectorizer(stop_words=STOP_WORDS)
+        features = self.vectorizer.fit_transform(documents)
+        n_docs = features.shape[0]
+
+        # The randomized SVD holds a dense n_docs x dims float64 basis, so
+        # large catalogs fit it on a sample and project the rest in batches
+        rng = np.random.default_rng(seed)
+        fit_rows = np.sort(rng.choice(n_docs, size=min(n_docs, SVD_SAMPLE), replace=False))
+        dims = max(1, min(dims, features.shape[1] - 1, len(fit_rows) - 1))
+        svd = TruncatedSVD(n_components=dims, random_state=seed)
+        svd.fit(features[fit_rows])
+        # Term x dimension, so projecting a query only reads its terms' rows
+        self.projection = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+
+        features = features.astype(np.float32)
+        vectors = np.empty((n_docs, dims), dtype=np.float32)
+        for start in range(0, n_docs, PROJECT_BATCH):
+            batch = slice(start, start + PROJECT_BATCH)
+            vectors[batch] = _normalize(features[batch] @ self.projection)
+        del features
+
+        n_lists = n_lists or max(1, round(n_docs / LIST_SIZE))
+        n_lists = max(1, min(n_lists, n_docs))
+        sample = rng.choice(n_docs, size=min(n_docs, n_lists * TRAIN_PER_LIST), replace=False)
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, random_state=seed, n_init=3)
+        kmeans.fit(vectors[np.sort(sample)])
+        assignment = kmeans.predict(vectors)
+
+        # Rows of a list are contiguous (in row order) so a probe is a slice
+        order = np.argsort(assignment, kind="stable")
+        self._set_index(
+            kmeans.cluster_centers_.astype(np.float32),
+            np.searchsorted(assignment[order], np.arange(n_lists + 1)),
+            order.astype(np.int64),
+            vectors[order],
+        )
+        self.nprobe = nprobe
+
+    def _set_index(self, centroids, list_ptr, ids, vectors):
+        self.centroids = centroids
+        self.list_ptr = list_ptr
+        self.ids = ids
+        self.vectors = vectors
+        self.slots = np.empty_like(ids)
+        self.slots[ids] = np.arange(len(ids))
+        self.list_of = np.repeat(np.arange(len(centroids)), np.diff(list_ptr))
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.ids)
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def extend(self, documents) -> "DenseRanker":
+        """A new ranker with ``documents`` appended as the next rows.
+
+        New vectors use the fitted projection and join their nearest list;
+        centroids are kept until the next refit. This ranker is unchanged.
+        """
+        vectors = self.embed(documents)
+        distances = (self.centroids ** 2).sum(axis=1) - 2 * vectors @ self.centroids.T
+        lists = np.concatenate((self.list_of, np.argmin(distances, axis=1)))
+        ids = np.concatenate((self.ids, np.arange(self.n_docs, self.n_docs + len(vectors))))
+        # Stable, so each list keeps its rows in row order with the new ones last
+        order = np.argsort(lists, kind="stable")
+
+        ranker = DenseRanker.__new__(DenseRanker)
+        ranker.vectorizer = self.vectorizer
+        ranker.projection = self.projection
+        ranker.nprobe = self.nprobe
+        ranker._set_index(
+            self.centroids,
+            np.searchsorted(lists[order], np.arange(self.n_lists + 1)),
+            ids[order],
+            np.concatenate((self.vectors, vectors))[order],
+        )
+        return ranker
+
+    def save(self, directory):
+        """Write the model and index as .npy files (see ``SemanticRanker.save``)."""
+        parent = os.path.dirname(directory) or "."
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".lsa-", dir=parent)
+
+        vocabulary = sorted(self.vectorizer.vocabulary_, key=self.vectorizer.vocabulary_.get)
+        with open(os.path.join(tmp, "vocabulary.json"), "w") as f:
+            json.dump({"stop_words": STOP_WORDS, "terms": vocabulary, "nprobe": self.nprobe}, f)
+        arrays = {
+            "idf": self.vectorizer.idf_,
+            "projection": self.projection,
+            "centroids": self.centroids,
+            "list_ptr": self.list_ptr,
+            "ids": self.ids,
+            "vectors": self.vectors,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), array)
+
+        try:
+            os.rename(tmp, directory)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory):
+        """Load a saved ranker, memory-mapping the document vectors."""
+        with open(os.path.join(directory, "vocabulary.json")) as f:
+            meta = json.load(f)
+        if meta.get("stop_words") != STOP_WORDS:
+            raise ValueError(f"Ranker in {directory} was fitted with different settings")
+
+        def array(name, mmap_mode=None):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+
+        ranker = cls.__new__(cls)
+        vocabulary = {term: i for i, term in enumerate(meta["terms"])}
+        ranker.vectorizer = TfidfVectorizer(stop_words=STOP_WORDS, vocabulary=vocabulary)
+        ranker.vectorizer.idf_ = array("idf")
+        ranker.projection = array("projection", "r")
+        ranker._set_index(array("centroids"), array("list_ptr"), array("ids"), array("vectors", "r"))
+        ranker.nprobe = meta["nprobe"]
+        return ranker
+
+    def embed(self, queries) -> np.ndarray:
+        """Unit-length latent vectors for ``queries`` (zero if no known term)."""
+        features = self.vectorizer.transform(queries)
+        vectors = np.zeros((features.shape[0], self.projection.shape[1]), dtype=np.float32)
+        for i in range(features.shape[0]):
+            # Gather just the query terms' rows; a sparse @ dense product
+            # would upcast the whole projection to float64 first
+            row = slice(features.indptr[i], features.indptr[i + 1])
+            vectors[i] = features.data[row].astype(np.float32) @ self.projection[features.indices[row]]
+        return _normalize(vectors)
+
+    def rank(self, query, top_k=5, candidates=None):
+        return self.rank_batch([query], top_k=top_k, candidates=candidates)[0]
+
+    def rank_batch(self, queries, top_k=5, candidates=None):
+        """Top-k (indices, scores) per query, best first, ties by row position.
+
+        With ``candidates`` (a boolean mask or row positions) only those
+        rows are ranked: a selective filter is scored exactly, row by row;
+        a broad one probes lists closest-first, skipping other rows, until
+        ``nprobe`` lists and at least ``top_k`` candidates were seen.
+        """
+        rows = None if candidates is None else candidate_rows(candidates, self.n_docs)
+        n_rows = self.n_docs if rows is None else len(rows)
+        k = min(top_k, n_rows)
+
+        allowed = None
+        per_list = np.diff(self.list_ptr)
+        if rows is not None:
+            allowed = np.zeros(self.n_docs, dtype=bool)
+            allowed[rows] = True
+            per_list = np.bincount(self.list_of[self.slots[rows]], minlength=self.n_lists)
+
+        results = []
+        for q in self.embed(queries):
+            if k == 0 or not q.any():
+                # No latent signal: lowest positions first, like the TF-IDF ranker
+                first = np.arange(k) if rows is None else rows[:k]
+                results.append((first.astype(np.int64), np.zeros(k)))
+            elif rows is not None and n_rows <= self._probe_cost(k, n_rows):
+                results.append(self._exact(q, rows, k))
+            else:
+                results.append(self._probe(q, k, per_list, allowed))
+        return results
+
+    def _probe_cost(self, k, n_rows) -> float:
+        """Rows an IVF search expects to scan to find ``k`` of ``n_rows`` candidates."""
+        list_size = self.n_docs / self.n_lists
+        hits_per_list = list_size * n_rows / self.n_docs
+        return max(self.nprobe, k / hits_per_list) * list_size
+
+    def _exact(self, q, rows, k):
+        scores = self.vectors[self.slots[rows]] @ q
+        return top_k_scores(rows, scores.astype(np.float64), k, len(rows))
+
+    def _probe(self, q, k, per_list, allowed):
+        closest = np.argsort(-(self.centroids @ q), kind="stable")
+        seen = np.cumsum(per_list[closest])
+        n_probe = max(min(self.nprobe, self.n_lists), int(np.searchsorted(seen, k)) + 1)
+        probed = closest[:n_probe]
+
+        # Each list is a contiguous block of vectors
+        blocks = [slice(self.list_ptr[i], self.list_ptr[i + 1]) for i in probed]
+        ids = np.concatenate([self.ids[b] for b in blocks])
+        scores = np.concatenate([self.vectors[b] @ q for b in blocks])
+        if allowed is not None:
+            keep = allowed[ids]
+            ids, scores = ids[keep], scores[keep]
+
+        order = np.argsort(ids, kind="stable")
+        return top_k_scores(ids[order], scores[order].astype(np.float64), k, self.n_docs)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
@@ -0,0 +1,60 @@
+import re
+
+MEAT_WORDS = [
+    "chicken", "beef", "mutton", "lamb", "goat", "pork", "bacon", "ham", "sausages?",
+    "salami", "pepperoni", "turkey", "duck", "veal", "(?:ground)?meat", "meatballs?", "mince",
+    "keema", "qeema", "kheema", "gelatine?", "lard", "liver", "trotters", "paya",
+    "bone broth",
+]
+SEAFOOD_WORDS = [
+    "fish", "salmon", "tuna", "prawns?", "shrimps?", "crabs?", "lobsters?", "anchov(?:y|ies)",
+    "sardines?", "cod", "tilapia", "squid", "calamari", "clams?", "mussels?", "oysters?",
+    "scallops?", "seafood", "surimi",
+]
+ANIMAL_PRODUCT_WORDS = [
+    "milk", "butter", "cream", "cheese", "ghee", "yogh?urt", "curd", "paneer", "khoya",
+    "malai", "buttermilk", "whey", "eggs?", "egg whites?", "egg yolks?", "honey", "mayonnaise",
+    "condensed milk",
+]
+# Plant-based items that would otherwise hit the dairy words
+PLANT_BASED = re.compile(r"\b(?:coconut|almond|soy|oat|rice|cashew|peanut|cocoa)\s+(?:milk|butter|cream|yogh?urt)\b")
+
+
+def _words(words):
+    return re.compile(r"\b(?:" + "|".join(words) + r")\b")
+
+
+MEAT = _words(MEAT_WORDS)
+SEAFOOD = _words(SEAFOOD_WORDS)
+ANIMAL_PRODUCTS = _words(ANIMAL_PRODUCT_WORDS)
+
+# Ingredients each diet rules out; a recipe violates a diet if any of its
+# ingredient items does
+DIET_RULES = {
+    "vegetarian": [MEAT, SEAFOOD],
+    "pescatarian": [MEAT],
+    "vegan": [MEAT, SEAFOOD, ANIMAL_PRODUCTS],
+}
+
+DIET_ALIASES = {
+    "veg": "vegetarian",
+    "veggie": "vegetarian",
+    "lacto vegetarian": "vegetarian",
+    "plant based": "vegan",
+    "plant-based": "vegan",
+    "pescetarian": "pescatarian",
+}
+
+
+def normalize_diet(diet) -> str | None:
+    """Canonical diet name, or None when the diet is unknown or unset."""
+    if not isinstance(diet, str):
+        return None
+    diet = diet.lower().strip()
+    diet = DIET_ALIASES.get(diet, diet)
+    return diet if diet in DIET_RULES else None
+
+
+def violates(item: str, diet: str) -> bool:
+    item = PLANT_BASED.sub(" ", item)
+    return any(pattern.search(item) for pattern in DIET_RULES[diet])
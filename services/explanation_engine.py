@@ -24,3 +24,38 @@ def explain_recommendation(row, preferences):
         reasons.append("is a strong overall match to your preferences")
 
     return " • ".join(reasons)
+
+
+def explain_batch(recs, preferences) -> list:
+    """``explain_recommendation`` for every row of ``recs``, from its match evidence.
+
+    Uses the evidence columns ``recommend_foods`` adds (see
+    ``MatchEvidence``) instead of rescanning each row's text; frames
+    without them fall back to the row-wise explanation.
+    """
+    if "time_delta" not in recs:
+        return [explain_recommendation(row, preferences) for row in recs.to_dict("records")]
+
+    reasons = [[] for _ in range(len(recs))]
+    if preferences.get("cuisine"):
+        for row, hit in zip(reasons, recs["cuisine_match"].tolist()):
+            if hit:
+                row.append(f"matches your interest in {preferences['cuisine']} cuisine")
+
+    if preferences.get("course"):
+        for row, hit in zip(reasons, recs["course_match"].tolist()):
+            if hit:
+                row.append(f"fits your selected course ({preferences['course']})")
+
+    if preferences.get("keywords"):
+        for row, found in zip(reasons, recs["matched_keywords"].tolist()):
+            matched = [k for k in preferences["keywords"] if k in found]
+            if matched:
+                row.append(f"includes {', '.join(matched)}")
+
+    if preferences.get("max_cook_time"):
+        for row, delta in zip(reasons, recs["time_delta"].tolist()):
+            if delta <= 0:
+                row.append("respects your time limit")
+
+    return [" • ".join(row or ["is a strong overall match to your preferences"]) for row in reasons]
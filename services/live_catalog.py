@@ -0,0 +1,538 @@
+import json
+import logging
+import numbers
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import replace
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, one process per journal
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from services.catalog_bundle import DEFAULT_RANKER, RANKERS, CatalogBundle, load_catalog_bundle
+from services.catalog_index import CatalogIndex
+from services.catalog_store import is_fresh, read_snapshot, source_digest, write_snapshot
+from services.data_loader import (
+    CATEGORY_COLUMNS,
+    REQUIRED_COLUMNS,
+    build_recipe_documents,
+    compact_catalog,
+    prepare_catalog,
+)
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".updates.jsonl"
+# Compacted catalogs are saved as <cache dir>/<csv stem>.live-<journal position>
+CHECKPOINT_INFIX = ".live"
+REFRESH_SECONDS = 5.0
+# Refit once deleted or appended rows make up this share of the catalog
+COMPACT_RATIO = 0.1
+
+
+def journal_path(path: str) -> str:
+    """The update journal kept next to the catalog CSV at ``path``."""
+    return os.path.splitext(path)[0] + JOURNAL_SUFFIX
+
+
+def checkpoint_prefix(path: str, cache_dir: str | None = None) -> str:
+    """Where the compacted catalogs of the CSV at ``path`` are saved."""
+    cache_dir = cache_dir or os.path.join(os.path.dirname(path) or ".", ".catalog_cache")
+    return os.path.join(cache_dir, os.path.splitext(os.path.basename(path))[0] + CHECKPOINT_INFIX)
+
+
+class JournalTruncated(Exception):
+    """The entries asked for were folded into a checkpoint and dropped."""
+
+    def __init__(self, start: int):
+        super().__init__(f"Journal now starts at position {start}")
+        self.start = start
+
+
+class CatalogJournal:
+    """Append-only JSON-lines log of catalog edits.
+
+    One entry per line, applied in file order:
+
+    - ``{"op": "upsert", "food_id": "<id>", "record": {...}}`` where the
+      record has the CSV columns (``REQUIRED_COLUMNS``)
+    - ``{"op": "delete", "food_id": "<id>"}``
+
+    Every process serving the same CSV reads the same journal, so an edit
+    sent to one worker reaches all of them on their next refresh.
+
+    Readers track a position: bytes of entries since the journal was
+    created. ``truncate`` drops the entries a checkpoint already holds and
+    starts the file with ``{"op": "start", "position": <n>}``, so positions
+    stay valid across truncations; asking for an earlier one raises
+    ``JournalTruncated``. Appends and truncations take an exclusive
+    ``flock`` on ``<journal>.lock``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @contextmanager
+    def locked(self):
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.path + ".lock", os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def append(self, entries: list):
+        data = "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8")
+        with self.locked():
+            # One O_APPEND write, so lines from concurrent writers never interleave
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def start(self) -> int:
+        """Position of the first entry still in the journal."""
+        try:
+            with open(self.path, "rb") as f:
+                return _header(f.readline())[0]
+        except FileNotFoundError:
+            return 0
+
+    def read(self, position: int = 0) -> tuple[list, int]:
+        """Entries after ``position``, and the position to read from next.
+
+        A trailing line still being written is left for the next read.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                start, header = _header(f.readline())
+                if position < start:
+                    raise JournalTruncated(start)
+                f.seek(header + position - start)
+                data = f.read()
+        except FileNotFoundError:
+            return [], position
+        end = data.rfind(b"\n") + 1
+        entries = []
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                logger.warning("Skipping unreadable catalog journal line %r", line[:200])
+        return entries, position + end
+
+    def truncate(self, position: int):
+        """Drop the entries before ``position``; caller holds ``locked``."""
+        try:
+            with open(self.path, "rb") as f:
+                start, header = _header(f.readline())
+                if position <= start:
+                    return
+                f.seek(header + position - start)
+                tail = f.read()
+        except FileNotFoundError:
+            tail = b""
+        fd, tmp = tempfile.mkstemp(prefix=".journal-", dir=os.path.dirname(self.path) or ".")
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps({"op": "start", "position": position}).encode("utf-8") + b"\n")
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+def _header(line: bytes) -> tuple[int, int]:
+    """(start position, header bytes) from a journal's first line."""
+    if line.startswith(b'{"op": "start"'):
+        return json.loads(line)["position"], len(line)
+    return 0, 0
+
+
+def upsert_entries(records) -> list:
+    """Journal entries for ``records``, validated the way the CSV is loaded.
+
+    A record replaces the recipe whose ``food_id`` it names; without one it
+    gets the id the loader would give it (from name, cuisine and course).
+    Raises ValueError for a record the loader would drop.
+    """
+    records = [dict(record) for record in records]
+    given = [record.pop("food_id", None) for record in records]
+    prepared = prepare_records(records)
+    return [
+        {"op": "upsert", "food_id": str(parse_food_id(food_id or generated)), "record": record}
+        for food_id, generated, record in zip(given, prepared["food_id"].tolist(), records)
+    ]
+
+
+def delete_entries(food_ids) -> list:
+    return [{"op": "delete", "food_id": str(parse_food_id(food_id))} for food_id in food_ids]
+
+
+def parse_food_id(value) -> int:
+    """``value`` as a ``food_id`` (an unsigned 64-bit integer), or ValueError."""
+    if isinstance(value, bool) or not isinstance(value, (numbers.Integral, str)):
+        raise ValueError(f"food_id must be an integer or a numeric string, got {value!r}")
+    food_id = int(value)
+    if not 0 <= food_id < 2**64:
+        raise ValueError(f"food_id out of range: {value!r}")
+    return food_id
+
+
+def prepare_records(records: list) -> pd.DataFrame:
+    """``prepare_catalog`` of raw records, one row per record or ValueError."""
+    raw = pd.DataFrame.from_records(records, columns=sorted(REQUIRED_COLUMNS))
+    for col in raw.columns:
+        # Literal columns may come as JSON lists/objects rather than the CSV's text
+        raw[col] = [v if isinstance(v, str) or v is None else repr(v) for v in raw[col]]
+    prepared = prepare_catalog(raw)
+    if len(prepared) != len(raw):
+        rejected = sorted(set(range(len(raw))) - set(prepared.index))
+        raise ValueError(f"Invalid recipe records (no name, course or cook time): {rejected}")
+    return prepared
+
+
+def apply_updates(bundle: CatalogBundle, entries: list, version: str) -> CatalogBundle:
+    """A new bundle with journal ``entries`` applied; ``bundle`` is unchanged.
+
+    Rows of every touched ``food_id`` are tombstoned and upserted records
+    are appended as new rows, transformed with the fitted ranker and merged
+    into the existing index, so nothing is refitted. For each ``food_id``
+    the last entry wins. Entries that cannot be applied (bad id or op, a
+    record the loader would drop) are logged and skipped, so one bad
+    journal line never blocks the ones after it.
+    """
+    latest = {}
+    for entry in entries:
+        try:
+            food_id = parse_food_id(entry["food_id"])
+            if entry["op"] not in ("upsert", "delete"):
+                raise ValueError(f"unknown op {entry['op']!r}")
+            record = dict(entry["record"]) if entry["op"] == "upsert" else None
+        except (KeyError, TypeError, ValueError) as exc:
+            logger.warning("Skipping catalog journal entry %.200r: %s", entry, exc)
+            continue
+        latest.pop(food_id, None)
+        latest[food_id] = record
+
+    upserts = {food_id: record for food_id, record in latest.items() if record is not None}
+    try:
+        added = prepare_records(list(upserts.values())) if upserts else None
+    except (TypeError, ValueError):
+        # Find the records at fault and apply the rest
+        for food_id, record in list(upserts.items()):
+            try:
+                prepare_records([record])
+            except (TypeError, ValueError) as exc:
+                logger.warning("Skipping catalog upsert of food_id %d: %s", food_id, exc)
+                del upserts[food_id], latest[food_id]
+        added = prepare_records(list(upserts.values())) if upserts else None
+
+    touched = np.fromiter(latest, dtype=np.uint64, count=len(latest))
+    deleted = np.isin(bundle.df["food_id"].to_numpy(), touched)
+    if bundle.index.deleted is not None:
+        deleted |= bundle.index.deleted
+
+    if not upserts:
+        return replace(bundle, index=bundle.index.with_deleted(deleted), version=version)
+
+    added["food_id"] = np.fromiter(upserts, dtype=np.uint64, count=len(upserts))
+    added, ingredients = compact_catalog(added)
+    start = int(bundle.df.index.max()) + 1 if len(bundle.df) else 0
+    added.index = pd.RangeIndex(start, start + len(added))
+
+    df = pd.concat([bundle.df, added[bundle.df.columns]])
+    for col in CATEGORY_COLUMNS:
+        df[col] = pd.Series(union_categoricals([bundle.df[col], added[col]]), index=df.index)
+    deleted = np.concatenate((deleted, np.zeros(len(added), dtype=bool)))
+    return CatalogBundle(
+        df=df,
+        ranker=bundle.ranker.extend(build_recipe_documents(added)),
+        index=bundle.index.extend(added, ingredients, deleted),
+        version=version,
+        ingredients=bundle.ingredients.extend(ingredients.take(range(len(ingredients)))),
+    )
+
+
+def compact_bundle(bundle: CatalogBundle, version: str) -> CatalogBundle:
+    """Drop tombstoned rows and refit the ranker and index on the rest."""
+    deleted = bundle.index.deleted
+    positions = np.arange(len(bundle.df)) if deleted is None else np.flatnonzero(~deleted)
+    df = bundle.df.iloc[positions].copy()
+    ingredients = bundle.ingredients.subset(positions)
+    return CatalogBundle(
+        df=df,
+        ranker=type(bundle.ranker)(build_recipe_documents(df)),
+        index=CatalogIndex(df, ingredients),
+        version=version,
+        ingredients=ingredients,
+    )
+
+
+def save_checkpoint(bundle: CatalogBundle, directory: str, digest: str):
+    """Write ``bundle`` as a catalog snapshot with its fitted ranker inside."""
+    df = bundle.df.assign(ingredients_list=bundle.ingredients.take(range(len(bundle.df))))
+    write_snapshot(df, directory, digest)
+    backend = next(name for name, cls in RANKERS.items() if isinstance(bundle.ranker, cls))
+    bundle.ranker.save(os.path.join(directory, backend))
+
+
+def load_checkpoint(directory: str, digest: str, backend: str | None = None) -> CatalogBundle | None:
+    """The bundle saved by ``save_checkpoint``, or None if it is missing or
+    was saved against another version of the CSV."""
+    if not is_fresh(directory, digest):
+        return None
+    backend = backend or DEFAULT_RANKER
+    df, lists = read_snapshot(directory)
+    ingredients = lists["ingredients_list"]
+    try:
+        ranker = RANKERS[backend].load(os.path.join(directory, backend))
+    except (OSError, ValueError):
+        ranker = None
+    if ranker is None or ranker.n_docs != len(df):
+        ranker = RANKERS[backend](build_recipe_documents(df))
+    return CatalogBundle(
+        df=df,
+        ranker=ranker,
+        index=CatalogIndex(df, ingredients),
+        version=digest,
+        ingredients=ingredients,
+    )
+
+
+class LiveCatalog:
+    """A catalog bundle that takes edits while it is being served.
+
+    ``current`` is always a complete, immutable ``CatalogBundle``: edits
+    and compactions build a new bundle and publish it with one attribute
+    assignment, so a reader that took ``current`` keeps a consistent view
+    for as long as it holds it. Versions are
+    ``<csv sha256>+<fitted position>.<position>``: the journal position the
+    ranker was last fitted at (a compaction or checkpoint) and the position
+    applied up to. Two processes at the same positions serve the same rows
+    in the same order, so they report the same version, and version-keyed
+    caches (``RankedResultCache``) rebind exactly when the rows change.
+
+    Edits go through the journal when there is one (see ``CatalogJournal``)
+    and are applied incrementally; ``compact`` later refits on the live
+    rows. ``start`` runs both in a background thread.
+
+    With ``checkpoints`` (see ``checkpoint_prefix``) a compaction also
+    saves the refitted catalog and drops the journal entries it holds, so
+    a restart loads the checkpoint and replays only later edits. Other
+    processes switch to the newest checkpoint on their next refresh, so
+    every process ends up on the same fit and the same versions.
+    """
+
+    def __init__(
+        self,
+        bundle: CatalogBundle,
+        journal: CatalogJournal | None = None,
+        compact_ratio: float = COMPACT_RATIO,
+        checkpoints: str | None = None,
+        position: int = 0,
+    ):
+        self.journal = journal
+        self.compact_ratio = compact_ratio
+        self.checkpoints = checkpoints
+        self._base_version = bundle.version
+        self._backend = next(name for name, cls in RANKERS.items() if isinstance(bundle.ranker, cls))
+        self._fitted_rows = len(bundle.df)
+        # Journal position of the next entry to apply, and of the last refit
+        self._position = position
+        self._fitted_at = position
+        self._bundle = replace(bundle, version=self._version()) if position else bundle
+        # Bumped when the bundle is replaced by a checkpoint
+        self._epoch = 0
+        # Entries applied while a compaction builds, replayed onto its result
+        self._replay = None
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.refresh()
+
+    @classmethod
+    def open(cls, path: str, cache_dir: str | None = None, backend: str | None = None) -> "LiveCatalog":
+        """Load the catalog at ``path`` (or its latest checkpoint) and replay its journal."""
+        journal = CatalogJournal(journal_path(path))
+        checkpoints = checkpoint_prefix(path, cache_dir)
+        start = journal.start()
+        if start:
+            bundle = load_checkpoint(f"{checkpoints}-{start}", source_digest(path), backend)
+            if bundle is not None:
+                return cls(bundle, journal, checkpoints=checkpoints, position=start)
+        # Without a usable checkpoint ``refresh`` reports what was dropped
+        return cls(load_catalog_bundle(path, cache_dir, backend), journal, checkpoints=checkpoints)
+
+    @property
+    def current(self) -> CatalogBundle:
+        return self._bundle
+
+    def upsert(self, records) -> str:
+        """Add or replace recipes (see ``upsert_entries``); returns the new version."""
+        return self.submit(upsert_entries(records))
+
+    def delete(self, food_ids) -> str:
+        return self.submit(delete_entries(food_ids))
+
+    def submit(self, entries: list) -> str:
+        """Journal ``entries`` and apply them; returns the new version."""
+        if self.journal is None:
+            with self._lock:
+                self._position += len(entries)
+                self._apply(entries)
+        else:
+            self.journal.append(entries)
+            self.refresh()
+        return self._bundle.version
+
+    def refresh(self) -> bool:
+        """Apply journal entries written since the last refresh, by any process."""
+        if self.journal is None:
+            return False
+        with self._lock:
+            start = self.journal.start()
+            if start > self._fitted_at:
+                # Another process compacted: take its checkpoint rather than keep an older fit
+                self._reload(start)
+            try:
+                entries, position = self.journal.read(self._position)
+            except JournalTruncated as exc:
+                self._reload(exc.start)
+                entries, position = self.journal.read(self._position)
+            self._position = position
+            if entries:
+                try:
+                    self._apply(entries)
+                except Exception:
+                    # Apply what can be applied, so the position still moves on
+                    logger.exception("Catalog journal batch failed; applying its entries one by one")
+                    for entry in entries:
+                        try:
+                            self._apply([entry])
+                        except Exception:
+                            logger.exception("Skipping catalog journal entry %.200r", entry)
+        return bool(entries)
+
+    def needs_compaction(self) -> bool:
+        bundle = self._bundle
+        deleted = 0 if bundle.index.deleted is None else int(bundle.index.deleted.sum())
+        appended = len(bundle.df) - self._fitted_rows
+        return deleted + appended > self.compact_ratio * max(self._fitted_rows, 1)
+
+    def compact(self) -> str:
+        """Refit on the live rows and swap the result in; returns its version.
+
+        Readers and edits carry on against the current bundle meanwhile;
+        edits applied during the build are replayed onto the refitted one.
+        The refitted catalog is then checkpointed (see ``checkpoints``).
+        """
+        with self._compact_lock:
+            with self._lock:
+                base = self._bundle
+                position, epoch = self._position, self._epoch
+                self._replay = []
+            try:
+                compacted = compact_bundle(base, base.version)
+            except BaseException:
+                with self._lock:
+                    self._replay = None
+                raise
+            with self._lock:
+                replay, self._replay = self._replay, None
+                if epoch != self._epoch:
+                    # Replaced by another process's checkpoint meanwhile
+                    return self._bundle.version
+                self._fitted_rows = len(compacted.df)
+                self._fitted_at = position
+                bundle = replace(compacted, version=self._version(position))
+                if replay:
+                    bundle = apply_updates(bundle, replay, self._version())
+                self._bundle = bundle
+            self._checkpoint(compacted, position)
+            return bundle.version
+
+    def start(self, interval: float = REFRESH_SECONDS):
+        """Refresh from the journal and compact when due, every ``interval`` seconds."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="catalog-updates", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+                if self.needs_compaction():
+                    self.compact()
+            except Exception:
+                logger.exception("Catalog update failed")
+
+    def _checkpoint(self, bundle: CatalogBundle, position: int):
+        """Save ``bundle`` (the catalog at journal ``position``) and drop
+        the journal entries before ``position``."""
+        if self.journal is None or self.checkpoints is None or position <= self.journal.start():
+            return
+        directory = f"{self.checkpoints}-{position}"
+        try:
+            if not is_fresh(directory, self._base_version):
+                save_checkpoint(bundle, directory, self._base_version)
+            with self.journal.locked():
+                self.journal.truncate(position)
+                start = self.journal.start()
+            # Older checkpoints are no use once the journal starts later
+            parent, stem = os.path.split(self.checkpoints)
+            for entry in os.listdir(parent):
+                prefix, _, at = entry.rpartition("-")
+                if prefix == stem and at.isdigit() and int(at) < start:
+                    shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+        except OSError:
+            logger.exception("Could not checkpoint the catalog at journal position %d", position)
+
+    def _reload(self, start: int):
+        # Caller holds self._lock; replaces the bundle with the checkpoint at ``start``
+        bundle = None
+        if self.checkpoints is not None:
+            bundle = load_checkpoint(f"{self.checkpoints}-{start}", self._base_version, self._backend)
+        if bundle is not None:
+            self._fitted_rows = len(bundle.df)
+            self._fitted_at = start
+            self._bundle = replace(bundle, version=self._version(start))
+            self._epoch += 1
+            self._position = start
+        elif self._position < start:
+            # Entries before ``start`` are only in the missing checkpoint
+            logger.warning("Catalog journal starts at %d and has no usable checkpoint; earlier edits are skipped", start)
+            self._position = start
+
+    def _apply(self, entries: list):
+        # Caller holds self._lock and has moved self._position past ``entries``
+        self._bundle = apply_updates(self._bundle, entries, self._version())
+        if self._replay is not None:
+            self._replay.extend(entries)
+
+    def _version(self, position: int | None = None) -> str:
+        position = self._position if position is None else position
+        return f"{self._base_version}+{self._fitted_at}.{position}"
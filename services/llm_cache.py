@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_extractions.sqlite3")
+
+
+def normalize_message(text: str) -> str:
+    """Collapse case, whitespace and trailing punctuation."""
+    text = re.sub(r"\s+", " ", text.lower()).strip()
+    return text.strip(" .!?,;")
+
+
+class ExtractionCache:
+    """On-disk cache of LLM preference extractions.
+
+    Extraction runs at temperature 0, so a message always maps to the same
+    preferences for a given model and system prompt; ``namespace`` carries
+    both, and entries from other namespaces are dropped on open. Each result
+    is stored under the exact message and its normalized form, and the
+    least recently used rows are evicted past ``max_entries``.
+    """
+
+    def __init__(self, path: str, namespace: str, max_entries: int = 20000):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS extractions ("
+                " key TEXT PRIMARY KEY,"
+                " namespace TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS extractions_last_used ON extractions (last_used)"
+            )
+            self._conn.execute("DELETE FROM extractions WHERE namespace != ?", (namespace,))
+
+    def _keys(self, text: str):
+        exact = f"{self.namespace}\x00exact\x00{text}"
+        normalized = f"{self.namespace}\x00norm\x00{normalize_message(text)}"
+        return [hashlib.sha256(k.encode()).hexdigest() for k in (exact, normalized)]
+
+    def get(self, text: str) -> dict | None:
+        with self._lock:
+            for key in self._keys(text):
+                row = self._conn.execute(
+                    "SELECT value FROM extractions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    with self._conn:
+                        self._conn.execute(
+                            "UPDATE extractions SET last_used = ? WHERE key = ?",
+                            (time.time(), key),
+                        )
+                    self.hits += 1
+                    return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def put(self, text: str, prefs: dict):
+        value = json.dumps(prefs)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO extractions (key, namespace, value, last_used)"
+                " VALUES (?, ?, ?, ?)",
+                [(key, self.namespace, value, now) for key in self._keys(text)],
+            )
+            self._conn.execute(
+                "DELETE FROM extractions WHERE key IN ("
+                " SELECT key FROM extractions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from copy import deepcopy
+from typing import Dict
+
+from services.llm_extractor import (
+    PREFERENCE_SCHEMA,
+    build_messages,
+    get_llm,
+    local_preferences,
+    parse_llm_output,
+)
+from services.preference_utils import validate_preferences
+from services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_CONCURRENCY = 8
+
+
+class FallbackPreferences(dict):
+    """Preferences returned when extraction gave up (deadline or errors).
+
+    The contents are the caller's ``previous`` preferences, so callers can
+    tell "nothing new was said" from "the message was not understood".
+    """
+
+
+class AsyncExtractionClient:
+    """Deadline-bounded, concurrency-limited preference extraction.
+
+    Calls run on a private event loop in a daemon thread, so the in-flight
+    cap (``max_concurrency``) holds across every Streamlit session thread
+    and every caller loop in the process. Each call has an overall
+    ``timeout`` covering queueing and retries; transient errors are retried
+    with jittered exponential backoff inside that budget. If the deadline
+    passes or the LLM keeps failing, the caller's ``previous`` preferences
+    are returned unchanged, as a ``FallbackPreferences``.
+
+    ``llm`` is anything with ``ainvoke(messages)``; it defaults to the Groq
+    client, which can be pointed at a local fake server with
+    ``GROQ_API_BASE`` (see ``stand_in_app``).
+    """
+
+    def __init__(
+        self,
+        llm=None,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        max_retries: int = 2,
+        backoff: float = 0.2,
+        cache=None,
+        rules=None,
+    ):
+        self.llm = llm
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache = cache
+        self.rules = rules
+
+        self.timeouts = 0
+        self.failures = 0
+        self._loop = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-client", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def aextract(self, user_message: str, previous: Dict | None = None) -> Dict:
+        with span("extract_local"):
+            local = local_preferences(user_message, cache=self.cache, rules=self.rules)
+        if local is not None:
+            return local
+        with span("extract_llm"):
+            future = asyncio.run_coroutine_threadsafe(
+                self._extract(user_message, previous), self._ensure_loop()
+            )
+            return await asyncio.wrap_future(future)
+
+    def extract(self, user_message: str, previous: Dict | None = None) -> Dict:
+        """Blocking wrapper for callers without an event loop (the Streamlit script)."""
+        with span("extract_local"):
+            local = local_preferences(user_message, cache=self.cache, rules=self.rules)
+        if local is not None:
+            return local
+        with span("extract_llm"):
+            future = asyncio.run_coroutine_threadsafe(
+                self._extract(user_message, previous), self._ensure_loop()
+            )
+            return future.result()
+
+    async def _extract(self, user_message: str, previous: Dict | None) -> Dict:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with self._semaphore:
+                    result = await self._invoke_with_retries(user_message)
+        except TimeoutError:
+            self.timeouts += 1
+            logger.warning("Preference extraction timed out after %.2fs", self.timeout)
+            return self._fallback(previous)
+        except Exception:
+            self.failures += 1
+            logger.exception("Preference extraction failed")
+            return self._fallback(previous)
+
+        if self.cache is not None:
+            self.cache.put(user_message, result)
+        return result
+
+    async def _invoke_with_retries(self, user_message: str) -> Dict:
+        llm = self.llm or get_llm()
+        messages = build_messages(user_message)
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await llm.ainvoke(messages)
+                return parse_llm_output(response.content)
+            except json.JSONDecodeError:
+                # Deterministic output; retrying would return the same text
+                raise
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+
+    def _fallback(self, previous: Dict | None) -> Dict:
+        return FallbackPreferences(validate_preferences(deepcopy(previous) if previous else {}))
+
+
+_default_client = None
+
+
+def get_client() -> AsyncExtractionClient:
+    global _default_client
+    if _default_client is None:
+        _default_client = AsyncExtractionClient()
+    return _default_client
+
+
+async def aextract_preferences(user_message: str, previous: Dict | None = None, client=None) -> Dict:
+    """Async counterpart of ``extract_preferences_from_text``."""
+    return await (client or get_client()).aextract(user_message, previous)
+
+
+def stand_in_app(latency: float = 0.5, failure_rate: float = 0.0, reply: Dict | None = None):
+    """An aiohttp app answering Groq chat completions after ``latency`` seconds.
+
+    It stands in for the Groq API in tests and load runs: point
+    ``GROQ_API_BASE`` (or ``ChatGroq(base_url=...)``) at it. A
+    ``failure_rate`` share of requests gets a 503 instead, and every
+    request's arrival time is kept in ``app["requests"]``. The completion
+    is ``reply`` (default: the empty preference schema) as JSON.
+    """
+    from aiohttp import web
+
+    content = json.dumps(reply if reply is not None else PREFERENCE_SCHEMA)
+
+    async def completions(request):
+        request.app["requests"].append(time.monotonic())
+        await asyncio.sleep(latency)
+        if random.random() < failure_rate:
+            raise web.HTTPServiceUnavailable()
+        body = await request.json()
+        return web.json_response({
+            "id": "stand-in",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", ""),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    app = web.Application()
+    app["requests"] = []
+    app.router.add_post("/openai/v1/chat/completions", completions)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in for the Groq chat API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before each answer")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered 503")
+    args = parser.parse_args()
+
+    from aiohttp import web
+
+    web.run_app(stand_in_app(args.latency, args.failure_rate), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 # services/llm_extractor.py
 
+import hashlib
 import json
 import re
 from typing import Dict
@@ -82,10 +83,26 @@ Example: "I don't care about cooking time" → {"skipped_fields": ["max_cook_tim
 Example: "Any cuisine is fine" → {"skipped_fields": ["cuisine"], ...}
 """
 
-llm = ChatGroq(
-    model="llama-3.1-8b-instant",
-    temperature=0
-)
+MODEL_NAME = "llama-3.1-8b-instant"
+# Rule-parser confidence at which the LLM round trip is skipped
+RULE_CONFIDENCE = 0.8
+
+_llm = None
+
+def get_llm():
+    """Create the Groq client on first use so the module imports offline."""
+    global _llm
+    if _llm is None:
+        _llm = ChatGroq(
+            model=MODEL_NAME,
+            temperature=0
+        )
+    return _llm
+
+def cache_namespace() -> str:
+    """Cache namespace: cached extractions are only valid for this model and prompt."""
+    prompt_hash = hashlib.sha256(SYSTEM_PROMPT.encode()).hexdigest()[:16]
+    return f"{MODEL_NAME}:{prompt_hash}"
 
 def normalize_preferences(prefs: dict) -> dict:
     for k, v in prefs.items():
@@ -95,16 +112,48 @@ def normalize_preferences(prefs: dict) -> dict:
             prefs[k] = [i.lower().strip() for i in v]
     return prefs
 
-def extract_preferences_from_text(user_message: str) -> Dict:
-    messages = [
+def build_messages(user_message: str) -> list:
+    return [
         SystemMessage(content=SYSTEM_PROMPT),
         HumanMessage(content=user_message)
     ]
 
-    response = llm.invoke(messages)
-    raw = response.content.strip()
-
-    parsed = json.loads(raw)
+def parse_llm_output(raw: str) -> Dict:
+    parsed = json.loads(raw.strip())
     normalized = normalize_preferences(parsed)
     return validate_preferences(normalized)
 
+def local_preferences(user_message: str, cache=None, rules=None) -> Dict | None:
+    """Preferences obtainable without an LLM call, or None.
+
+    ``rules`` is an optional ``RuleExtractor``; its result is used when it
+    parses the message with at least ``RULE_CONFIDENCE``. Otherwise
+    ``cache`` is consulted.
+    """
+    if rules is not None:
+        parsed, confidence = rules.parse(user_message)
+        if confidence >= RULE_CONFIDENCE:
+            return validate_preferences(normalize_preferences(parsed))
+
+    if cache is not None:
+        cached = cache.get(user_message)
+        if cached is not None:
+            return validate_preferences(cached)
+    return None
+
+def extract_preferences_from_text(user_message: str, client=None, cache=None, rules=None) -> Dict:
+    """Extract preferences with the LLM, or locally when that is good enough.
+
+    ``client`` is anything with ``invoke(messages)`` returning an object with
+    ``content``; it defaults to the shared Groq client.
+    """
+    local = local_preferences(user_message, cache=cache, rules=rules)
+    if local is not None:
+        return local
+
+    response = (client or get_llm()).invoke(build_messages(user_message))
+    validated = parse_llm_output(response.content)
+
+    if cache is not None:
+        cache.put(user_message, validated)
+    return validated
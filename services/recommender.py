@@ -1,34 +1,18 @@
-import pandas as pd
-
-def score_row(row, prefs: dict) -> float:
-    score = 0.0
-
-    for kw in prefs.get("keywords", []):
-        if kw in row["keyword"]:
-            score += 2
-        if kw in row["summary"]:
-            score += 1
-
-    if prefs.get("max_cook_time"):
-        score += max(
-            0,
-            (prefs["max_cook_time"] - row["total_time_minutes"])
-            / prefs["max_cook_time"]
-        )
+from itertools import combinations
 
-    for ing in prefs.get("selected_ingredients", []):
-        if ing in row["ingredients_list"]:
-            score += 1.5
-
-    return score
-
-def cook_time_penalty(row, max_time):
-    if not max_time or pd.isna(row["total_time_minutes"]):
-        return 0
+import numpy as np
+import pandas as pd
 
-    diff = row["total_time_minutes"] - max_time
-    return -max(0, diff) * 0.05   # gentle penalty
+from services.catalog_index import CatalogIndex
+from services.result_cache import MatchEvidence, RankedResult, preference_key
+from services.scoring import ingredient_filter_mask, keyword_filter_mask, score_candidates
+from services.term_matcher import scan_candidates
+from services.tracing import span
 
+# Hard filters the ladder may drop when nothing passes them, in order
+RELAXABLE_FILTERS = ("course", "cuisine")
+# Cook-time tiers: a 20% buffer first, then double, then triple the request
+COOK_TIME_FACTORS = (1.2, 2, 3)
 
 def build_query_from_prefs(prefs: dict):
     parts = []
@@ -42,131 +26,201 @@ def build_query_from_prefs(prefs: dict):
 
     return " ".join(parts)
 
-def recommend_foods(df, preferences, semantic_ranker, top_k=5):
-    query = build_query_from_prefs(preferences)
+def recommend_foods(df, preferences, semantic_ranker, top_k=5, catalog_index=None, cache=None):
+    """Return one page of recommendations and what was relaxed to find them.
+
+    The second value is the ``relaxation`` dict of ``rank_candidates``
+    (empty when every constraint held). With a ``RankedResultCache`` the
+    full ranked list is kept per preference set (ignoring ``offset``), so
+    "next"/"another" only slices it.
+    """
+    if catalog_index is None:
+        catalog_index = CatalogIndex(df)
+
+    key = preference_key(preferences) if cache is not None else None
+    result = cache.get(key) if cache is not None else None
+    if result is None:
+        with span("rank_candidates"):
+            result = rank_candidates(df, preferences, semantic_ranker, catalog_index)
+        if cache is not None:
+            cache.put(key, result)
 
-    # 1️⃣ Broad semantic retrieval
-    indices, scores = semantic_ranker.rank(
-        query,
-        top_k=min(len(df), 100)
-    )
-
-    ranked = df.iloc[indices].copy()
-    ranked["semantic_score"] = scores
-
-    # 2️⃣ HARD filters (using substring match for flexibility)
-    if preferences.get("course"):
-        ranked = ranked[ranked["course"].str.contains(preferences["course"], case=False, na=False)]
-
-    if preferences.get("cuisine"):
-        ranked = ranked[ranked["cuisine"].str.contains(preferences["cuisine"], case=False, na=False)]
+    # 6️⃣ Pagination
+    offset = preferences.get("offset", 0)
+    page = slice(offset, offset + top_k)
+
+    recs = df.iloc[result.positions[page]].copy()
+    recs["semantic_score"] = result.semantic_scores[page]
+    recs["final_score"] = result.final_scores[page]
+    if result.evidence is not None:
+        for column, values in result.evidence.columns(page).items():
+            recs[column] = pd.Series(values, index=recs.index, dtype=object if isinstance(values, list) else None)
+    return recs, dict(result.relaxation)
+
+def rank_candidates(df, preferences, semantic_ranker, catalog_index) -> RankedResult:
+    """Rank the catalog for ``preferences`` in a single retrieval pass.
+
+    Constraints that nothing satisfies are relaxed instead of failing:
+    course, then cuisine are dropped if no row passes the hard filters,
+    and the ingredient, keyword and cook-time steps fall back as described
+    below. What was given up is returned as ``RankedResult.relaxation``:
+
+    - ``dropped``: hard filters dropped, e.g. ``["course"]``
+    - ``ingredients`` / ``keywords``: True if no candidate matched any of
+      them (keywords are not checked once the ingredients were relaxed)
+    - ``max_cook_time``: the factor of the requested time that was used
+      (2 or 3), or None when no candidate fits even triple the time
+    """
+    query = build_query_from_prefs(preferences)
+    relaxation = {}
+
+    # 1️⃣ HARD filters as a bitmap over the whole catalog (substring match
+    # resolved through the tag index); exclusions and diet are never relaxed
+    with span("hard_filters") as stage:
+        allowed = hard_filter_mask(preferences, catalog_index)
+        if allowed is not None and not allowed.any():
+            # Fewest filters dropped first, course before cuisine
+            fields = [f for f in RELAXABLE_FILTERS if preferences.get(f)]
+            levels = [c for size in range(1, len(fields) + 1) for c in combinations(fields, size)]
+            for dropped in levels:
+                allowed = hard_filter_mask(preferences, catalog_index, dropped)
+                if allowed is None or allowed.any():
+                    relaxation["dropped"] = list(dropped)
+                    break
+        stage.count(len(df) if allowed is None else np.count_nonzero(allowed))
+
+    # 2️⃣ Semantic retrieval restricted to the rows passing the hard filters
+    with span("retrieve") as stage:
+        indices, scores = semantic_ranker.rank(
+            query,
+            top_k=min(len(df), 100),
+            candidates=allowed,
+        )
+        stage.count(len(indices))
+    times = df["total_time_minutes"].to_numpy()[indices]
 
-    if ranked.empty:
-        return ranked, False
+    if len(indices) == 0:
+        return RankedResult(indices, scores, scores, relaxation)
 
-    # 3️⃣ Ingredient filtering - try strict first, then relax
+    # One pass over the candidates' text finds every keyword/ingredient hit
     selected_ingredients = preferences.get("selected_ingredients", [])
-    ingredients_relaxed = False
+    keywords = preferences.get("keywords", [])
+    terms = [kw.lower() for kw in keywords] + list(keywords) + [ing.lower() for ing in selected_ingredients]
+    with span("scan_terms"):
+        matches = scan_candidates(catalog_index, indices, terms)
+
+    # 3️⃣-5️⃣ Relaxation ladder: every level is a mask over the same
+    # candidates, and each step keeps its strict level only if some
+    # candidate still passes it
+    keep = np.ones(len(indices), dtype=bool)
 
+    # 3️⃣ Ingredient filtering - any selected ingredient, else relaxed
     if selected_ingredients:
-        # Check if any selected ingredient is in ingredients_list or ingredients_text
-        def has_ingredient(row):
-            ingredients_text = str(row.get("ingredients_text", "")).lower()
-            ingredients_list = row.get("ingredients_list", [])
-            for ing in selected_ingredients:
-                ing_lower = ing.lower()
-                if ing_lower in ingredients_text or any(ing_lower in item.lower() for item in ingredients_list):
-                    return True
-            return False
-
-        strict_filtered = ranked[ranked.apply(has_ingredient, axis=1)]
-
-        if not strict_filtered.empty:
-            ranked = strict_filtered
-        else:
-            # No recipes with selected ingredients, mark as relaxed
-            ingredients_relaxed = True
-
-    # 4️⃣ Keyword filtering - try strict first, then relax
-    keywords = preferences.get("keywords", [])
-    keywords_relaxed = False
-
-    if keywords and not ingredients_relaxed:
-        # Check if any keyword is in name, summary, keyword, or ingredients
-        def has_keyword(row):
-            searchable = (
-                str(row.get("name", "")).lower() + " " +
-                str(row.get("summary", "")).lower() + " " +
-                str(row.get("keyword", "")).lower() + " " +
-                str(row.get("ingredients_text", "")).lower()
-            )
-            for kw in keywords:
-                if kw.lower() in searchable:
-                    return True
-            return False
-
-        strict_filtered = ranked[ranked.apply(has_keyword, axis=1)]
-
-        if not strict_filtered.empty:
-            ranked = strict_filtered
-        else:
-            keywords_relaxed = True
-
-    if ranked.empty:
-        return ranked, False
-
-    # 5️⃣ Cook time handling - try strict first, then progressively relax
-    max_time = preferences.get("max_cook_time")
-    time_relaxed = False
+        with span("ingredient_filter") as stage:
+            strict = ingredient_filter_mask(matches, indices, selected_ingredients)
+            if strict.any():
+                keep = strict
+            else:
+                relaxation["ingredients"] = True
+            stage.count(np.count_nonzero(keep))
+
+    # 4️⃣ Keyword filtering - any keyword, else relaxed
+    if keywords and "ingredients" not in relaxation:
+        with span("keyword_filter") as stage:
+            strict = keep & keyword_filter_mask(matches, indices, keywords)
+            if strict.any():
+                keep = strict
+            else:
+                relaxation["keywords"] = True
+            stage.count(np.count_nonzero(keep))
 
+    # 5️⃣ Cook time handling - the tightest tier any remaining candidate meets
+    max_time = preferences.get("max_cook_time")
     if max_time:
-        # First try: strict filter with 20% buffer
-        time_tolerance = max_time * 1.2
-        strict_filtered = ranked[ranked["total_time_minutes"] <= time_tolerance]
-
-        if not strict_filtered.empty:
-            ranked = strict_filtered
-        else:
-            # Second try: double the requested time
-            relaxed_tolerance = max_time * 2
-            relaxed_filtered = ranked[ranked["total_time_minutes"] <= relaxed_tolerance]
-
-            if not relaxed_filtered.empty:
-                ranked = relaxed_filtered
-                time_relaxed = True
-            else:
-                # Third try: triple the requested time (max reasonable)
-                max_reasonable = max_time * 3
-                reasonable_filtered = ranked[ranked["total_time_minutes"] <= max_reasonable]
-
-                if not reasonable_filtered.empty:
-                    ranked = reasonable_filtered
-                    time_relaxed = True
-                else:
-                    # Last resort: just mark as relaxed, will show closest by score
-                    time_relaxed = True
-
-    # Soft cook time scoring - heavily penalize recipes far from requested time
-    def cook_time_bonus(row):
-        if not max_time or pd.isna(row["total_time_minutes"]):
-            return 0.0
-        diff = row["total_time_minutes"] - max_time
-        if diff <= 0:
-            return 0.5  # Bonus for being under time
-        # Stronger penalty for being over time
-        return -min(diff / max_time, 5.0)  # Cap penalty at 5x
-
-    ranked["final_score"] = (
-        ranked["semantic_score"]
-        + ranked.apply(lambda r: score_row(r, preferences), axis=1)
-        + ranked.apply(cook_time_bonus, axis=1)
+        with span("cook_time_filter") as stage:
+            tiers = cook_time_tiers(times, max_time)
+            tier = tiers[keep].min()
+            if tier < len(COOK_TIME_FACTORS):
+                keep &= tiers == tier
+            if tier > 0:
+                # Past the last tier nothing is cut: closest by score
+                relaxation["max_cook_time"] = COOK_TIME_FACTORS[tier] if tier < len(COOK_TIME_FACTORS) else None
+            stage.count(np.count_nonzero(keep))
+
+    with span("score"):
+        indices, scores, times = indices[keep], scores[keep], times[keep]
+        final_scores = score_candidates(matches, indices, scores, times, preferences)
+        order = pd.Series(final_scores).sort_values(ascending=False).index.to_numpy()
+        indices = indices[order]
+
+    with span("evidence"):
+        evidence = match_evidence(preferences, catalog_index, matches, indices, times[order])
+    return RankedResult(indices, scores[order], final_scores[order], relaxation, evidence)
+
+def hard_filter_mask(preferences, catalog_index, dropped=()):
+    """Rows passing course, cuisine, exclusions and diet; None if unfiltered.
+
+    Fields in ``dropped`` are left out.
+    """
+    allowed = None
+    for field in ("course", "cuisine"):
+        if preferences.get(field) and field not in dropped:
+            mask = catalog_index.mask(field, preferences[field])
+            allowed = mask if allowed is None else allowed & mask
+
+    blocked = catalog_index.blocked_mask(
+        preferences.get("excluded_ingredients"), preferences.get("diet")
     )
+    if blocked is not None:
+        allowed = ~blocked if allowed is None else allowed & ~blocked
+    return allowed
 
-    ranked = ranked.sort_values("final_score", ascending=False)
+def cook_time_tiers(times, max_time) -> np.ndarray:
+    """Per row, the first ``COOK_TIME_FACTORS`` tier its time fits in.
 
-    # 6️⃣ Pagination
-    offset = preferences.get("offset", 0)
+    Rows over the last tier, or with no known time, get
+    ``len(COOK_TIME_FACTORS)``.
+    """
+    limits = max_time * np.asarray(COOK_TIME_FACTORS, dtype=float)
+    return np.searchsorted(limits, times, side="left")
+
+def match_evidence(preferences, catalog_index, matches, positions, times) -> MatchEvidence:
+    """What each ranked candidate matched, from the hits already found.
+
+    Keywords and ingredients come from the candidates' term scan, tags
+    from the cached tag bitmaps, so no row text is read again.
+    """
+    keywords = preferences.get("keywords", [])
+    ingredients = preferences.get("selected_ingredients", [])
+    tags = {
+        field: catalog_index.mask(field, preferences[field])[positions]
+        if preferences.get(field) else np.zeros(len(positions), dtype=bool)
+        for field in ("cuisine", "course")
+    }
+    max_time = preferences.get("max_cook_time")
+    return MatchEvidence(
+        keywords=keyword_evidence(matches, positions, keywords),
+        ingredients=found_per_row(
+            [matches.contains("ingredients_text", ing.lower(), positions) for ing in ingredients],
+            ingredients, len(positions),
+        ),
+        cuisine=tags["cuisine"],
+        course=tags["course"],
+        time_delta=times - max_time if max_time else np.full(len(positions), np.nan),
+    )
 
-    # Return relaxed status (any constraint was relaxed)
-    any_relaxed = time_relaxed or ingredients_relaxed or keywords_relaxed
-    return ranked.iloc[offset : offset + top_k], any_relaxed
+def keyword_evidence(matches, positions, keywords) -> tuple:
+    """Per candidate, the keywords found in its summary or ingredients."""
+    found = [
+        matches.contains("summary", kw.lower(), positions)
+        | matches.contains("ingredients_text", kw.lower(), positions)
+        for kw in keywords
+    ]
+    return found_per_row(found, keywords, len(positions))
+
+def found_per_row(found, terms, n_rows) -> tuple:
+    """Transpose per-term hit masks into, per row, the terms it hit."""
+    return tuple(
+        tuple(term for term, hits in zip(terms, found) if hits[i])
+        for i in range(n_rows)
+    )
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+# Preference fields that only select a page of an already ranked list
+PAGING_FIELDS = ("offset",)
+
+
+@dataclass(frozen=True)
+class MatchEvidence:
+    """Why each ranked row matched, found while ranking and aligned with it.
+
+    - ``keywords`` / ``ingredients``: per row, the requested keywords found
+      in its summary or ingredients, and the selected ingredients it has
+    - ``cuisine`` / ``course``: whether the row's tag matches the requested
+      one (all False when none was requested)
+    - ``time_delta``: minutes over (positive) or under the requested cook
+      time, NaN when none was requested
+    """
+
+    keywords: tuple
+    ingredients: tuple
+    cuisine: np.ndarray
+    course: np.ndarray
+    time_delta: np.ndarray
+
+    def columns(self, rows: slice) -> dict:
+        """Evidence for ``rows`` as DataFrame columns."""
+        return {
+            "matched_keywords": list(self.keywords[rows]),
+            "matched_ingredients": list(self.ingredients[rows]),
+            "cuisine_match": self.cuisine[rows],
+            "course_match": self.course[rows],
+            "time_delta": self.time_delta[rows],
+        }
+
+
+@dataclass(frozen=True)
+class RankedResult:
+    """A fully ranked candidate list, best first, as catalog row positions.
+
+    ``relaxation`` describes the constraints given up to find these rows
+    (see ``recommender.rank_candidates``); it is empty when all of them
+    held. ``evidence`` holds what each row matched, for the explanation.
+    """
+
+    positions: np.ndarray
+    semantic_scores: np.ndarray
+    final_scores: np.ndarray
+    relaxation: dict
+    evidence: MatchEvidence | None = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def relaxed(self) -> bool:
+        return bool(self.relaxation)
+
+
+def preference_key(prefs: dict) -> str:
+    """Canonical hash of the preferences that affect ranking.
+
+    List order is dropped: keyword and ingredient order does not change
+    the ranking, and ``merge_preferences`` builds them from sets.
+    """
+    canonical = {}
+    for key, value in prefs.items():
+        if key in PAGING_FIELDS:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            value = sorted(value)
+        canonical[key] = value
+    raw = json.dumps(canonical, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+class RankedResultCache:
+    """Bounded LRU + TTL cache of ranked candidate lists.
+
+    Shared by every session in a process, so access is locked. Entries are
+    only valid for one catalog version; ``bind`` drops everything when the
+    version changes.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 900, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def bind(self, version: str):
+        with self._lock:
+            if version != self.version:
+                self.evictions += len(self._entries)
+                self._entries.clear()
+                self.version = version
+
+    def get(self, key: str) -> RankedResult | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, result = entry
+            if self._clock() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, result: RankedResult):
+        with self._lock:
+            self._entries[key] = (self._clock(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "version": self.version,
+            }
@@ -0,0 +1,190 @@
+import re
+import threading
+from copy import deepcopy
+
+from services.llm_extractor import PREFERENCE_SCHEMA
+
+# Words that carry no preference on their own; they neither add nor cost confidence
+FILLER_WORDS = {
+    "a", "an", "the", "i", "im", "i'm", "me", "my", "we", "us", "you", "it", "is", "are",
+    "am", "be", "to", "of", "for", "and", "or", "with", "some", "something", "anything",
+    "want", "wanna", "would", "like", "need", "have", "had", "make", "cook", "cooking",
+    "eat", "get", "give", "show", "find", "suggest", "recommend", "please", "can", "could",
+    "maybe", "today", "tonight", "now", "dish", "dishes", "food", "recipe", "recipes",
+    "meal", "in", "mood", "craving", "good", "nice", "let's", "lets", "that", "this",
+    "which", "what", "how", "about", "just", "really", "also", "too", "then", "so",
+}
+
+COURSE_WORDS = {"breakfast", "lunch", "dinner", "snack", "dessert", "main", "appetizer", "soup", "side"}
+# Catalog course tags that read as keywords or diets rather than a course
+AMBIGUOUS_COURSE_TAGS = {"sweet", "vegeterian"}
+TAG_SUFFIXES = (" cuisine", " recipes")
+
+NUMBER_WORDS = {
+    "five": 5, "ten": 10, "fifteen": 15, "twenty": 20, "twenty five": 25, "thirty": 30,
+    "forty": 40, "forty five": 45, "fifty": 50, "sixty": 60, "ninety": 90,
+}
+DURATION_PREFIX = r"(?:\b(?:under|within|less than|in|max|maximum|at most|no more than|up to|around|about|only)\s+)?"
+DURATION_PATTERNS = [
+    (re.compile(DURATION_PREFIX + r"an? hour and a half\b|\b1\.5\s*(?:hours?|hrs?)\b"), lambda m: 90),
+    (re.compile(DURATION_PREFIX + r"half an? hour\b|\bhalf hour\b"), lambda m: 30),
+    (re.compile(DURATION_PREFIX + r"(\d+(?:\.\d+)?)\s*(?:hours?|hrs?|h)\b"), lambda m: round(float(m.group(1)) * 60)),
+    (re.compile(DURATION_PREFIX + r"(?:an|one) hour\b"), lambda m: 60),
+    (re.compile(DURATION_PREFIX + r"(\d+)\s*(?:minutes?|mins?|m)\b"), lambda m: int(m.group(1))),
+    (
+        re.compile(DURATION_PREFIX + r"(" + "|".join(w.replace(" ", "[ -]") for w in sorted(NUMBER_WORDS, key=len, reverse=True)) + r")[ -]?(?:minutes?|mins?)\b"),
+        lambda m: NUMBER_WORDS[m.group(1).replace("-", " ")],
+    ),
+]
+
+INDIFFERENCE = re.compile(
+    r"\b(?:i\s+)?(?:don'?t|do not|doesn'?t|does not)\s+(?:care|mind|matter)\b"
+    r"|\bno (?:preference|issue)s?\b|\bnot important\b|\bwhatever\b|\bopen to anything\b"
+    r"|\banything (?:is )?(?:fine|ok|okay|works)\b|\bany\b|\bskip\b|\bno matter\b"
+)
+SKIP_FIELD_WORDS = {
+    "max_cook_time": re.compile(r"\b(?:time|cooking time|cook time|minutes|long|duration|how long)\b"),
+    "cuisine": re.compile(r"\b(?:cuisines?|country|style|origin)\b"),
+    "course": re.compile(r"\b(?:course|meal type|type of (?:meal|dish)|dish type)\b"),
+    "keywords": re.compile(r"\b(?:ingredients?|keywords?|what'?s in it)\b"),
+}
+NEGATION = r"(?:no|without|exclude|excluding|except|avoid|not|skip|hold the|allergic to)\s+"
+CLAUSE_SPLIT = re.compile(r"[,.;!?]|\b(?:but|and)\b")
+WORD = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+
+
+class RuleExtractor:
+    """Deterministic preference parser for simply structured messages.
+
+    Vocabularies come from the catalog: course and cuisine tags, and the
+    ingredient items (single-word items as keywords, multi-word items as
+    phrases). ``parse`` returns a ``PREFERENCE_SCHEMA`` dict plus a
+    confidence: the share of non-filler words it could account for. The
+    LLM is only worth calling when that confidence is low.
+    """
+
+    def __init__(self, cuisines, courses, ingredients):
+        self.cuisines = _phrase_pattern(cuisines)
+        self.courses = _phrase_pattern(courses)
+        self.ingredients = _phrase_pattern(ingredients)
+        self.excluded = re.compile(r"\b" + NEGATION + r"(?:any\s+)?(" + _alternation(ingredients) + r")\b")
+
+    @classmethod
+    def from_catalog(cls, index):
+        cuisines = set()
+        for tag in index.postings["cuisine"]:
+            cuisines.add(tag)
+            for suffix in TAG_SUFFIXES:
+                if tag.endswith(suffix):
+                    cuisines.add(tag[: -len(suffix)])
+
+        courses = (set(index.postings["course"]) - AMBIGUOUS_COURSE_TAGS) | COURSE_WORDS
+
+        ingredients = {
+            item for item in index.ingredients.vocab
+            if re.fullmatch(r"[a-z]+(?: [a-z]+)*", item) and len(item) > 2
+        }
+        return cls(cuisines, courses, ingredients)
+
+    def parse(self, text: str) -> tuple[dict, float]:
+        text = text.lower().strip()
+        prefs = deepcopy(PREFERENCE_SCHEMA)
+        covered = []
+
+        for start, body in _clauses(text):
+            if not INDIFFERENCE.search(body):
+                continue
+            fields = [f for f, pattern in SKIP_FIELD_WORDS.items() if pattern.search(body)]
+            if not fields:
+                continue
+            prefs["skipped_fields"].extend(f for f in fields if f not in prefs["skipped_fields"])
+            covered.append((start, start + len(body)))
+
+        for pattern, minutes in DURATION_PATTERNS:
+            for match in pattern.finditer(text):
+                if _is_covered(match.span(), covered):
+                    continue
+                if prefs["max_cook_time"] is None:
+                    prefs["max_cook_time"] = minutes(match)
+                covered.append(match.span())
+
+        for match in self.excluded.finditer(text):
+            if _is_covered(match.span(), covered):
+                continue
+            prefs["excluded_ingredients"].append(match.group(1))
+            covered.append(match.span())
+
+        for pattern, field in ((self.cuisines, "cuisine"), (self.courses, "course")):
+            for match in pattern.finditer(text):
+                if _is_covered(match.span(), covered):
+                    continue
+                if prefs[field] is None:
+                    prefs[field] = match.group(0)
+                covered.append(match.span())
+
+        for match in self.ingredients.finditer(text):
+            if _is_covered(match.span(), covered):
+                continue
+            if match.group(0) not in prefs["keywords"]:
+                prefs["keywords"].append(match.group(0))
+            covered.append(match.span())
+
+        content = [
+            m.span() for m in WORD.finditer(text)
+            if m.group(0) not in FILLER_WORDS
+        ]
+        if not content or not any(prefs[k] for k in prefs):
+            return prefs, 0.0
+
+        explained = sum(1 for span in content if _is_covered(span, covered))
+        return prefs, explained / len(content)
+
+
+class CatalogRules:
+    """A ``RuleExtractor`` that follows a catalog as it is edited.
+
+    ``catalog`` is a ``CatalogBundle`` or a ``LiveCatalog``. The extractor
+    is rebuilt from the current index the first time ``parse`` runs after
+    the catalog version changes, so cuisines, courses and ingredients
+    added since startup are recognized without a restart.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._version = None
+        self._extractor = None
+        self._lock = threading.Lock()
+
+    @property
+    def extractor(self) -> RuleExtractor:
+        bundle = getattr(self.catalog, "current", self.catalog)
+        with self._lock:
+            if bundle.version != self._version:
+                self._extractor = RuleExtractor.from_catalog(bundle.index)
+                self._version = bundle.version
+            return self._extractor
+
+    def parse(self, text: str) -> tuple[dict, float]:
+        return self.extractor.parse(text)
+
+
+def _alternation(phrases):
+    # Longest first so "north indian" wins over "indian"
+    ordered = sorted(phrases, key=len, reverse=True)
+    return "(?:" + "|".join(re.escape(p) for p in ordered) + ")"
+
+
+def _phrase_pattern(phrases):
+    return re.compile(r"\b" + _alternation(phrases) + r"\b")
+
+
+def _clauses(text):
+    start = 0
+    for sep in CLAUSE_SPLIT.finditer(text):
+        yield start, text[start:sep.start()]
+        start = sep.end()
+    yield start, text[start:]
+
+
+def _is_covered(span, covered):
+    return any(a <= span[0] and span[1] <= b for a, b in covered)
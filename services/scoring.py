@@ -0,0 +1,57 @@
+import numpy as np
+
+from services.catalog_index import SEARCHABLE
+
+
+def ingredient_filter_mask(index, positions, ingredients) -> np.ndarray:
+    """Candidates whose ingredients mention any of the selected ingredients."""
+    hits = np.zeros(len(positions), dtype=bool)
+    for ing in ingredients:
+        hits |= index.contains("ingredients_text", ing.lower(), positions)
+    return hits
+
+
+def keyword_filter_mask(index, positions, keywords) -> np.ndarray:
+    """Candidates whose name, summary, keyword or ingredients mention any keyword."""
+    hits = np.zeros(len(positions), dtype=bool)
+    for kw in keywords:
+        hits |= index.contains(SEARCHABLE, kw.lower(), positions)
+    return hits
+
+
+def preference_scores(index, positions, times, prefs: dict) -> np.ndarray:
+    """Vectorized equivalent of the old per-row ``score_row``.
+
+    Terms are added in the same order as the row-wise loop so the float
+    results match it exactly.
+    """
+    score = np.zeros(len(positions), dtype=np.float64)
+
+    for kw in prefs.get("keywords", []):
+        score += np.where(index.contains("keyword", kw, positions), 2.0, 0.0)
+        score += np.where(index.contains("summary", kw, positions), 1.0, 0.0)
+
+    max_time = prefs.get("max_cook_time")
+    if max_time:
+        score += np.maximum(0, (max_time - times) / max_time)
+
+    for ing in prefs.get("selected_ingredients", []):
+        score += np.where(index.has_ingredient(ing, positions), 1.5, 0.0)
+
+    return score
+
+
+def cook_time_bonus(times, max_time) -> np.ndarray:
+    """Bonus for being under the requested time, capped penalty for going over."""
+    if not max_time:
+        return np.zeros(len(times), dtype=np.float64)
+    diff = times - max_time
+    return np.where(diff <= 0, 0.5, -np.minimum(diff / max_time, 5.0))
+
+
+def score_candidates(index, positions, semantic_scores, times, prefs: dict) -> np.ndarray:
+    return (
+        semantic_scores
+        + preference_scores(index, positions, times, prefs)
+        + cook_time_bonus(times, prefs.get("max_cook_time"))
+    )
@@ -1,21 +1,167 @@
+import json
+import os
+import shutil
+import tempfile
+
+from scipy.sparse import csr_matrix, vstack
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
+STOP_WORDS = "english"
+# Below this fraction of candidate rows, score only the candidates
+FILTER_FIRST_MAX_FRACTION = 0.5
+
 class SemanticRanker:
     def __init__(self, documents):
-        self.vectorizer = TfidfVectorizer(stop_words="english")
+        self.vectorizer = TfidfVectorizer(stop_words=STOP_WORDS)
         self.doc_vectors = self.vectorizer.fit_transform(documents)
 
-    def rank(self, query, top_k=5):
-        query_vec = self.vectorizer.transform([query])
-        scores = cosine_similarity(query_vec, self.doc_vectors)[0]
-        top_indices = scores.argsort()[::-1][:top_k]
-        return top_indices, scores[top_indices]
+    @classmethod
+    def from_fitted(cls, vocabulary, idf, doc_vectors):
+        """Rebuild a ranker from a fitted vocabulary/idf without refitting."""
+        ranker = cls.__new__(cls)
+        ranker.vectorizer = TfidfVectorizer(stop_words=STOP_WORDS, vocabulary=vocabulary)
+        ranker.vectorizer.idf_ = idf
+        ranker.doc_vectors = doc_vectors
+        return ranker
+
+    def save(self, directory):
+        """Write vocabulary, idf and the CSR doc matrix as plain arrays.
+
+        The directory is assembled under a temporary name and renamed into
+        place, so a concurrent reader sees either nothing or all of it.
+        """
+        parent = os.path.dirname(directory) or "."
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tfidf-", dir=parent)
+
+        vocabulary = sorted(self.vectorizer.vocabulary_, key=self.vectorizer.vocabulary_.get)
+        with open(os.path.join(tmp, "vocabulary.json"), "w") as f:
+            json.dump({"stop_words": STOP_WORDS, "terms": vocabulary, "shape": self.doc_vectors.shape}, f)
+        np.save(os.path.join(tmp, "idf.npy"), self.vectorizer.idf_)
+        np.save(os.path.join(tmp, "data.npy"), self.doc_vectors.data)
+        np.save(os.path.join(tmp, "indices.npy"), self.doc_vectors.indices)
+        np.save(os.path.join(tmp, "indptr.npy"), self.doc_vectors.indptr)
+
+        try:
+            os.rename(tmp, directory)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory):
+        """Load a saved ranker, memory-mapping the doc matrix arrays."""
+        with open(os.path.join(directory, "vocabulary.json")) as f:
+            meta = json.load(f)
+        if meta.get("stop_words") != STOP_WORDS:
+            raise ValueError(f"Ranker in {directory} was fitted with different settings")
+
+        vocabulary = {term: i for i, term in enumerate(meta["terms"])}
+        idf = np.load(os.path.join(directory, "idf.npy"))
+        arrays = [
+            np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            for name in ("data", "indices", "indptr")
+        ]
+        doc_vectors = csr_matrix(tuple(arrays), shape=tuple(meta["shape"]), copy=False)
+        return cls.from_fitted(vocabulary, idf, doc_vectors)
+
+    @property
+    def n_docs(self) -> int:
+        return self.doc_vectors.shape[0]
+
+    def extend(self, documents) -> "SemanticRanker":
+        """A new ranker with ``documents`` appended as the next rows.
+
+        The documents are transformed with the fitted vocabulary and idf
+        (terms unseen at fit time are ignored until the next refit); this
+        ranker is unchanged.
+        """
+        ranker = SemanticRanker.__new__(SemanticRanker)
+        ranker.vectorizer = self.vectorizer
+        ranker.doc_vectors = vstack([self.doc_vectors, self.vectorizer.transform(documents)], format="csr")
+        return ranker
+
+    def rank(self, query, top_k=5, candidates=None):
+        return self.rank_batch([query], top_k=top_k, candidates=candidates)[0]
+
+    def rank_batch(self, queries, top_k=5, candidates=None):
+        """Top-k (indices, scores) for each query from one sparse product.
+
+        Query and document vectors are L2-normalized by the vectorizer, so
+        the dot product is the cosine similarity. Only documents sharing a
+        term with a query have a stored score; the top-k is selected from
+        those, and zero-score documents fill the remainder in row order.
+
+        ``candidates`` (a boolean mask or array of row positions) restricts
+        the ranking to those rows. A selective filter multiplies only the
+        candidate rows (filter-first); a broad one scores every document
+        and keeps the candidate rows of the result (rank-first), which
+        avoids copying most of the matrix. Both return the same top-k.
+        Documents are the left operand, so no transposed copy of the
+        document matrix is built.
+        """
+        query_vecs = self.vectorizer.transform(queries).T.tocsr()
+        n_docs = self.doc_vectors.shape[0]
+
+        if candidates is None:
+            rows = None
+            scores = self.doc_vectors @ query_vecs
+        else:
+            rows = candidate_rows(candidates, n_docs)
+            if len(rows) <= FILTER_FIRST_MAX_FRACTION * n_docs:
+                scores = self.doc_vectors[rows] @ query_vecs
+            else:
+                scores = (self.doc_vectors @ query_vecs).tocsr()[rows]
+        # One row of scores per query
+        scores = scores.T.tocsr()
+        scores.sort_indices()
+
+        n_rows = n_docs if rows is None else len(rows)
+        k = min(top_k, n_rows)
+        results = []
+        for i in range(len(queries)):
+            row = slice(scores.indptr[i], scores.indptr[i + 1])
+            cols, values = top_k_scores(scores.indices[row], scores.data[row], k, n_rows)
+            results.append((cols if rows is None else rows[cols], values))
+        return results
+
+
+def candidate_rows(candidates, n_docs):
+    """Sorted unique row positions from a boolean mask or position array."""
+    candidates = np.asarray(candidates)
+    if candidates.dtype == bool:
+        if len(candidates) != n_docs:
+            raise ValueError(f"Candidate mask has {len(candidates)} rows, expected {n_docs}")
+        return np.flatnonzero(candidates)
+    return np.unique(candidates.astype(np.int64))
+
+
+def top_k_scores(cols, values, k, n_docs):
+    """Highest ``k`` scores, ties broken by lower row position.
+
+    ``cols`` must be sorted. Runs in O(nnz + k log k) using a partition
+    instead of sorting every score.
+    """
+    if len(values) > k:
+        threshold = np.partition(values, len(values) - k)[len(values) - k]
+        above = np.flatnonzero(values > threshold)
+        tied = np.flatnonzero(values == threshold)[: k - len(above)]
+        keep = np.concatenate((above, tied))
+        cols, values = cols[keep], values[keep]
+
+    order = np.lexsort((cols, -values))
+    cols, values = cols[order].astype(np.int64), values[order]
+
+    if len(cols) < k:
+        # Zero-score documents, lowest positions first
+        fill = np.setdiff1d(np.arange(min(n_docs, k + len(cols))), cols)[: k - len(cols)]
+        cols = np.concatenate((cols, fill))
+        values = np.concatenate((values, np.zeros(len(fill))))
+    return cols, values
 
 
 # semantic_ranker = None
 
 # def init_semantic_ranker(documents):
 #     global semantic_ranker
-#     semantic_ranker = SemanticRanker(documents)
\ No newline at end of file
+#     semantic_ranker = SemanticRanker(documents)
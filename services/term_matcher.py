@@ -0,0 +1,120 @@
+import re
+
+import numpy as np
+
+from services.catalog_index import SEARCHABLE, TEXT_COLUMNS
+
+# Joins candidate rows in the scanned buffer; user terms never contain it
+ROW_SEPARATOR = "\x00"
+
+
+class TermMatcher:
+    """Find every occurrence of a fixed set of terms in one pass per text.
+
+    Plays the role of an Aho-Corasick automaton using the regex engine: the
+    alternation of all terms (longest first) is searched left to right,
+    resuming one character after each hit so overlapping occurrences are
+    not skipped. Each hit is the longest term starting at its offset; every
+    other term starting there is a prefix of it, so those are added from a
+    precomputed prefix table instead of another scan.
+    """
+
+    def __init__(self, terms):
+        self.terms = list(dict.fromkeys(terms))
+        self.lengths = np.array([len(t) for t in self.terms], dtype=np.int64)
+        self.always = [i for i, t in enumerate(self.terms) if not t]
+
+        ids = {t: i for i, t in enumerate(self.terms) if t}
+        self._implied = {
+            t: [ids[p] for p in ids if t.startswith(p)]
+            for t in ids
+        }
+        ordered = sorted(ids, key=len, reverse=True)
+        self._pattern = (
+            re.compile("|".join(re.escape(t) for t in ordered))
+            if ordered else None
+        )
+
+    def find(self, text: str):
+        """(start offsets, term ids) of every occurrence in ``text``."""
+        starts, ids = [], []
+        if self._pattern is not None:
+            implied = self._implied
+            search = self._pattern.search
+            match = search(text)
+            while match is not None:
+                start = match.start()
+                for term_id in implied[match.group()]:
+                    starts.append(start)
+                    ids.append(term_id)
+                match = search(text, start + 1)
+        return np.asarray(starts, dtype=np.int64), np.asarray(ids, dtype=np.int64)
+
+
+class CandidateMatches:
+    """Term hits for a fixed set of candidate rows, per text column.
+
+    Built by ``scan_candidates`` from a single pass over the candidates'
+    searchable text (name, summary, keyword and ingredients joined with
+    spaces, as the keyword filter has always seen it). Each hit is credited
+    to the column it lies in; hits straddling a column boundary only count
+    for ``SEARCHABLE``.
+
+    Implements ``contains``/``has_ingredient`` like ``CatalogIndex`` for
+    any subset of the scanned positions, so the scoring functions can use
+    it in place of the index.
+    """
+
+    def __init__(self, index, positions: np.ndarray, terms, hits: dict):
+        self.index = index
+        self.terms = {t: i for i, t in enumerate(terms)}
+        self._order = np.argsort(positions, kind="stable")
+        self._sorted = positions[self._order]
+        self._hits = hits
+
+    def _rows(self, positions: np.ndarray) -> np.ndarray:
+        return self._order[np.searchsorted(self._sorted, positions)]
+
+    def contains(self, column: str, term: str, positions: np.ndarray) -> np.ndarray:
+        term_id = self.terms.get(term)
+        if term_id is None:
+            return self.index.contains(column, term, positions)
+        return self._hits[column][self._rows(positions), term_id]
+
+    def has_ingredient(self, item: str, positions: np.ndarray) -> np.ndarray:
+        return self.index.has_ingredient(item, positions)
+
+
+def scan_candidates(index, positions: np.ndarray, terms) -> CandidateMatches:
+    """Match ``terms`` against the candidates' text in one pass."""
+    matcher = TermMatcher(terms)
+    columns = [index.texts(col, positions) for col in TEXT_COLUMNS]
+    n_rows, n_terms = len(positions), len(matcher.terms)
+
+    # Segment bounds of each column inside a row's searchable text
+    lengths = np.array(
+        [[len(t) for t in texts] for texts in columns], dtype=np.int64
+    ).reshape(len(TEXT_COLUMNS), n_rows).T
+    seg_end = np.cumsum(lengths + 1, axis=1) - 1
+    seg_start = seg_end - lengths
+    row_start = np.zeros(n_rows, dtype=np.int64)
+    if n_rows:
+        row_start[1:] = np.cumsum(seg_end[:, -1] + 1)[:-1]
+
+    buffer = ROW_SEPARATOR.join(" ".join(parts) for parts in zip(*columns))
+    starts, ids = matcher.find(buffer)
+    rows = np.searchsorted(row_start, starts, side="right") - 1
+    local = starts - row_start[rows]
+    ends = local + matcher.lengths[ids]
+
+    hits = {SEARCHABLE: np.zeros((n_rows, n_terms), dtype=bool)}
+    hits[SEARCHABLE][rows, ids] = True
+    for c, col in enumerate(TEXT_COLUMNS):
+        inside = (local >= seg_start[rows, c]) & (ends <= seg_end[rows, c])
+        hits[col] = np.zeros((n_rows, n_terms), dtype=bool)
+        hits[col][rows[inside], ids[inside]] = True
+
+    for term_id in matcher.always:
+        for column_hits in hits.values():
+            column_hits[:, term_id] = True
+    return CandidateMatches(index, positions, matcher.terms, hits)
@@ -0,0 +1,315 @@
+import argparse
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
+
+from PIL import Image
+
+DEFAULT_CACHE_DIR = "data/.thumbnails"
+DEFAULT_MAX_BYTES = 256 * 2**20
+THUMBNAIL_SIZE = (320, 320)
+FETCH_TIMEOUT = 5.0
+# Largest source image accepted
+MAX_SOURCE_BYTES = 20 * 2**20
+# A failed fetch is not retried for this long
+RETRY_SECONDS = 600
+# Background fetches run at once by ``prefetch``
+PREFETCH_WORKERS = 4
+FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+USER_AGENT = "food-recommendation-chatbot/thumbnails"
+FETCH_SCHEMES = ("http", "https")
+
+
+class ThumbnailCache:
+    """Downscaled recipe images on disk, bounded in bytes.
+
+    Thumbnails are keyed by ``food_id`` and a hash of the image URL, so a
+    recipe whose image changes (a catalog upsert) gets a new thumbnail and
+    the old one ages out. Each source image is fetched once, shrunk to fit
+    ``size`` and re-encoded (WebP by default), so cards load a few KB from
+    local disk instead of the full image from the recipe site. Least
+    recently used thumbnails are evicted once the directory passes
+    ``max_bytes``; a hit refreshes the file's mtime, so the order survives
+    restarts.
+
+    Fetch failures return None (callers fall back to the source URL) and
+    are not retried for ``RETRY_SECONDS``. ``image_base`` fetches from
+    another host (see ``rewrite_host``) while keying by the catalog URL.
+    Thread-safe; processes sharing the directory only ever see complete
+    files.
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        size=THUMBNAIL_SIZE,
+        image_format: str = "webp",
+        quality: int = 75,
+        timeout: float = FETCH_TIMEOUT,
+        image_base: str | None = None,
+    ):
+        if image_format not in FORMATS:
+            raise ValueError(f"Unknown thumbnail format {image_format!r}; expected one of {sorted(FORMATS)}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = tuple(size)
+        self.image_format = image_format
+        self.quality = quality
+        self.timeout = timeout
+        self.image_base = image_base
+        self._lock = threading.Lock()
+        self._failed = {}
+        # Keys being fetched by ``prefetch``, and its lazily started pool
+        self._pending = set()
+        self._pool = None
+        os.makedirs(directory, exist_ok=True)
+
+        # key -> file size, least recently used first
+        entries = []
+        suffix = f".{image_format}"
+        for entry in os.scandir(directory):
+            if entry.name.endswith(suffix) and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, entry.name[:-len(suffix)], stat.st_size))
+        self._sizes = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._bytes = sum(self._sizes.values())
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.{self.image_format}")
+
+    def cached(self, food_id, url: str) -> str | None:
+        """The thumbnail's path if it is cached, without fetching."""
+        if not url:
+            return None
+        key = thumbnail_key(food_id, url)
+        with self._lock:
+            if key not in self._sizes:
+                return None
+            self._sizes.move_to_end(key)
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process sharing the directory
+            with self._lock:
+                self._forget(key)
+            return None
+        return path
+
+    def get(self, food_id, url: str) -> str | None:
+        """The thumbnail's path, fetching and encoding it on a miss."""
+        path = self.cached(food_id, url)
+        if path is not None or not url:
+            return path
+
+        key = thumbnail_key(food_id, url)
+        with self._lock:
+            failed_at = self._failed.get(key)
+        if failed_at is not None and time.monotonic() - failed_at < RETRY_SECONDS:
+            return None
+        source = rewrite_host(url, self.image_base) if self.image_base else url
+        try:
+            data = self._encode(fetch_image(source, self.timeout))
+        except (OSError, ValueError, Image.DecompressionBombError):
+            with self._lock:
+                self._failed[key] = time.monotonic()
+            return None
+        return self._store(key, data)
+
+    def get_many(self, items, workers: int = 8) -> list:
+        """``get`` for ``(food_id, url)`` pairs, fetching misses concurrently."""
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+            return list(pool.map(lambda item: self.get(*item), items))
+
+    def prefetch(self, items):
+        """Fetch the misses among ``(food_id, url)`` pairs in the background.
+
+        Returns at once, so a reply never waits on the image host; until a
+        thumbnail lands, ``cached`` returns None and cards use the URL.
+        """
+        for food_id, url in items:
+            if not url or self.cached(food_id, url) is not None:
+                continue
+            key = thumbnail_key(food_id, url)
+            with self._lock:
+                if key in self._pending:
+                    continue
+                self._pending.add(key)
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(PREFETCH_WORKERS, thread_name_prefix="thumbnails")
+            self._pool.submit(self._prefetch_one, key, food_id, url)
+
+    def _prefetch_one(self, key: str, food_id, url: str):
+        try:
+            self.get(food_id, url)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _encode(self, data: bytes) -> bytes:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("RGB", self.size)
+            image = image.convert("RGB")
+            image.thumbnail(self.size)
+            out = io.BytesIO()
+            image.save(out, FORMATS[self.image_format], quality=self.quality)
+        return out.getvalue()
+
+    def _store(self, key: str, data: bytes) -> str:
+        path = self.path(key)
+        fd, tmp = tempfile.mkstemp(prefix=".thumb-", dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._forget(key)
+            self._sizes[key] = len(data)
+            self._bytes += len(data)
+            self._failed.pop(key, None)
+            evicted = []
+            while self._bytes > self.max_bytes and len(self._sizes) > 1:
+                old = next(iter(self._sizes))
+                self._forget(old)
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(self.path(old))
+            except FileNotFoundError:
+                pass
+        return path
+
+    def _forget(self, key: str):
+        # Caller holds self._lock
+        self._bytes -= self._sizes.pop(key, 0)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+
+def thumbnail_key(food_id, url: str) -> str:
+    """Cache key of a recipe's image: ``<food_id>-<url hash>``."""
+    return f"{food_id}-{hashlib.sha256(url.encode()).hexdigest()[:16]}"
+
+
+class _HTTPRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Follows redirects to http(s) only (urllib also follows them to ftp://)."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if urlsplit(newurl).scheme.lower() not in FETCH_SCHEMES:
+            raise ValueError(f"Redirect to a non-http(s) URL: {newurl}")
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+_opener = urllib.request.build_opener(_HTTPRedirectHandler)
+
+
+def fetch_image(url: str, timeout: float = FETCH_TIMEOUT) -> bytes:
+    # urlopen also reads file:// and ftp://; catalog URLs must not reach local files
+    if urlsplit(url).scheme.lower() not in FETCH_SCHEMES:
+        raise ValueError(f"Not an http(s) image URL: {url}")
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with _opener.open(request, timeout=timeout) as response:
+        data = response.read(MAX_SOURCE_BYTES + 1)
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ValueError(f"Image larger than {MAX_SOURCE_BYTES} bytes: {url}")
+    return data
+
+
+def rewrite_host(url: str, base: str) -> str:
+    """``url`` with its scheme and host replaced by those of ``base``."""
+    target = urlsplit(base)
+    return urlunsplit(urlsplit(url)._replace(scheme=target.scheme, netloc=target.netloc))
+
+
+def prewarm(cache: ThumbnailCache, df, workers: int = 8) -> dict:
+    """Fetch the thumbnail of every catalog row not cached yet."""
+    items = [
+        (food_id, url)
+        for food_id, url in zip(df["food_id"].tolist(), df["imgurl"].tolist())
+        if cache.cached(food_id, url) is None
+    ]
+    start = time.perf_counter()
+    found = sum(path is not None for path in cache.get_many(items, workers))
+    return {
+        "rows": len(df),
+        "fetched": found,
+        "failed": len(items) - found,
+        "seconds": time.perf_counter() - start,
+        "cached_bytes": cache.total_bytes,
+    }
+
+
+def stand_in_app(size=(1200, 800)):
+    """An aiohttp app answering every GET with the same generated JPEG.
+
+    It stands in for the recipe image host in tests and benchmarks (see
+    ``--image-base``). ``/missing/...`` paths return 404.
+    """
+    from aiohttp import web
+
+    # Noise so the image weighs what a photo does (a flat colour is ~1 KB)
+    out = io.BytesIO()
+    Image.merge("RGB", [Image.effect_noise(size, sigma) for sigma in (40, 60, 80)]).save(out, "JPEG", quality=90)
+    photo = out.getvalue()
+
+    async def image(request):
+        if request.path.startswith("/missing/"):
+            raise web.HTTPNotFound()
+        return web.Response(body=photo, content_type="image/jpeg")
+
+    app = web.Application()
+    app.router.add_get("/{path:.*}", image)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recipe thumbnail cache")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    warm = commands.add_parser("prewarm", help="fetch thumbnails for the whole catalog")
+    warm.add_argument("--data", default="data/foods_data.csv")
+    warm.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    warm.add_argument("--max-mb", type=int, default=DEFAULT_MAX_BYTES // 2**20)
+    warm.add_argument("--format", choices=sorted(FORMATS), default="webp")
+    warm.add_argument("--workers", type=int, default=8)
+    warm.add_argument("--image-base", help="fetch from this host instead, e.g. a stand-in server")
+
+    stand_in = commands.add_parser("stand-in", help="serve generated images in place of the image host")
+    stand_in.add_argument("--host", default="127.0.0.1")
+    stand_in.add_argument("--port", type=int, default=8089)
+
+    args = parser.parse_args()
+    if args.command == "stand-in":
+        from aiohttp import web
+
+        web.run_app(stand_in_app(), host=args.host, port=args.port)
+        return
+
+    from services.data_loader import load_food_dataset
+
+    cache = ThumbnailCache(args.cache_dir, args.max_mb * 2**20, image_format=args.format, image_base=args.image_base)
+    report = prewarm(cache, load_food_dataset(args.data), args.workers)
+    print(
+        f"{report['fetched']} fetched, {report['failed']} failed of {report['rows']} rows "
+        f"in {report['seconds']:.1f}s; cache holds {report['cached_bytes'] / 2**20:.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
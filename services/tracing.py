@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextvars import ContextVar
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Upper bounds of the candidate count histogram buckets
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 1000, 10_000, 100_000, 1_000_000)
+RECENT_TURNS = 100
+
+_trace = ContextVar("trace", default=None)
+_span = ContextVar("span", default=None)
+
+
+class Histogram:
+    """Cumulative-on-read histogram with fixed bucket bounds, per label value."""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float):
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bucket] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        """Lines of the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, n) for key, (counts, total, n) in self._series.items()}
+        for key in sorted(series):
+            counts, total, n = series[key]
+            label = f'{self.label}="{_escape(key)}"'
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if isinstance(bound, str) else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {total!r}")
+            lines.append(f"{self.name}_count{{{label}}} {n}")
+        return lines
+
+
+class Trace:
+    """Spans of one chat turn, in the order they finished."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.spans = []
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": self.started,
+            "total_ms": (time.perf_counter() - self._start) * 1000,
+            "spans": self.spans,
+        }
+
+
+class Span:
+    __slots__ = ("tracer", "name", "parent", "candidates", "_start", "_token")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.candidates = None
+
+    def __enter__(self):
+        self.parent = _span.get()
+        self._token = _span.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self._start
+        _span.reset(self._token)
+        self.tracer.stage_seconds.observe(self.name, seconds)
+        trace = _trace.get()
+        if trace is not None:
+            record = {
+                "name": self.name,
+                "parent": self.parent.name if self.parent is not None else None,
+                "start_ms": (self._start - trace._start) * 1000,
+                "duration_ms": seconds * 1000,
+            }
+            if self.candidates is not None:
+                record["candidates"] = self.candidates
+            trace.spans.append(record)
+        return False
+
+    def count(self, candidates: int):
+        """Record how many candidates are left after this stage."""
+        self.candidates = int(candidates)
+        self.tracer.stage_candidates.observe(self.name, self.candidates)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def count(self, candidates):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _NoopTurn:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Turn:
+    __slots__ = ("tracer", "trace", "_token")
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def __enter__(self):
+        self.trace = Trace()
+        self._token = _trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, *exc):
+        _trace.reset(self._token)
+        self.tracer._finish(self.trace.to_dict())
+        return False
+
+
+class Tracer:
+    """Per-stage timings of chat turns.
+
+    ``span(name)`` times a block into the ``chat_stage_seconds`` histogram;
+    ``Span.count`` records the candidates left after it into
+    ``chat_stage_candidates``. Inside ``turn()`` the spans are also
+    collected into a ``Trace``, kept in ``recent`` and appended as one JSON
+    line to ``dump_path`` if set. When disabled, ``span`` and ``turn``
+    return shared no-op context managers.
+
+    Spans follow ``contextvars``, so a turn that hops threads with
+    ``asyncio.to_thread`` keeps its trace.
+    """
+
+    def __init__(self, enabled: bool = True, dump_path: str | None = None):
+        self.enabled = enabled
+        self.dump_path = dump_path
+        self.stage_seconds = Histogram(
+            "chat_stage_seconds", "Latency of chat turn stages in seconds.", "stage", LATENCY_BUCKETS
+        )
+        self.stage_candidates = Histogram(
+            "chat_stage_candidates", "Candidates left after each pipeline stage.", "stage", COUNT_BUCKETS
+        )
+        self.recent = deque(maxlen=RECENT_TURNS)
+        self._dump_lock = threading.Lock()
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NOOP
+        return Span(self, name)
+
+    def turn(self):
+        if not self.enabled:
+            return _NoopTurn()
+        return _Turn(self)
+
+    def render_prometheus(self) -> str:
+        return "\n".join(self.stage_seconds.render() + self.stage_candidates.render()) + "\n"
+
+    def _finish(self, trace: dict):
+        self.recent.append(trace)
+        if self.dump_path:
+            line = json.dumps(trace) + "\n"
+            with self._dump_lock, open(self.dump_path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide tracer; TRACING=0 turns it off, TRACE_DUMP names a JSONL file
+tracer = Tracer(os.getenv("TRACING", "1") != "0", os.getenv("TRACE_DUMP") or None)
+span = tracer.span
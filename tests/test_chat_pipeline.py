@@ -0,0 +1,79 @@
+import asyncio
+import shutil
+
+import pytest
+
+from services.catalog_bundle import load_catalog_bundle
+from services.chat_pipeline import FALLBACK_MESSAGE, RECOMMEND_HEADING, ChatPipeline, new_session_state
+from services.llm_client import FallbackPreferences
+from services.result_cache import RankedResultCache
+
+PREFERENCES = {"course": "main course", "cuisine": "pakistani", "keywords": ["chicken"], "max_cook_time": 60}
+
+
+class FakeClient:
+    """Returns queued preferences instead of calling an LLM."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.messages = []
+
+    def extract(self, message, previous=None):
+        self.messages.append(message)
+        return self.replies.pop(0)
+
+    async def aextract(self, message, previous=None):
+        return self.extract(message, previous)
+
+
+@pytest.fixture(scope="module")
+def bundle(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("catalog")
+    path = shutil.copy("data/foods_data.csv", directory / "foods.csv")
+    return load_catalog_bundle(str(path), backend="tfidf")
+
+
+def pipeline(bundle, *replies):
+    return ChatPipeline(bundle, FakeClient(*replies), result_cache=RankedResultCache())
+
+
+def test_recommends_once_preferences_are_complete(bundle):
+    chat = pipeline(bundle, dict(PREFERENCES))
+    state = new_session_state()
+    reply = chat.handle("pakistani chicken main course within an hour", state)
+
+    assert reply["content"].endswith(RECOMMEND_HEADING)
+    assert 0 < len(reply["recipes"]) <= 5
+    assert state["preferences"]["cuisine"] == "pakistani"
+    cards = chat.cards(reply["recipes"])
+    assert [card["food_id"] for card in cards] == [recipe["food_id"] for recipe in reply["recipes"]]
+    assert all(card["name"] and card["explanation"] for card in cards)
+
+
+def test_asks_for_missing_preferences(bundle):
+    chat = pipeline(bundle, {"cuisine": "pakistani"})
+    state = new_session_state()
+    reply = chat.handle("something pakistani", state)
+
+    assert "recipes" not in reply
+    assert "?" in reply["content"]
+    assert state["preferences"]["cuisine"] == "pakistani"
+
+
+def test_greeting_skips_extraction(bundle):
+    chat = pipeline(bundle)
+    reply = chat.handle("hello", new_session_state())
+
+    assert chat.extraction_client.messages == []
+    assert "recipes" not in reply
+
+
+def test_fallback_says_results_are_unchanged(bundle):
+    chat = pipeline(bundle, dict(PREFERENCES), FallbackPreferences())
+    state = new_session_state()
+    first = chat.handle("pakistani chicken main course within an hour", state)
+    again = asyncio.run(chat.ahandle("zq vx unparseable", state))
+
+    assert again["content"].startswith(FALLBACK_MESSAGE)
+    assert again["recipes"] == first["recipes"]
+    assert not first["content"].startswith(FALLBACK_MESSAGE)
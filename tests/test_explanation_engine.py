@@ -0,0 +1,27 @@
+import shutil
+
+import pytest
+
+from services.catalog_bundle import load_catalog_bundle
+from services.explanation_engine import explain_batch, explain_recommendation
+from services.recommender import recommend_foods
+
+
+@pytest.fixture(scope="module")
+def bundle(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("catalog")
+    return load_catalog_bundle(str(shutil.copy("data/foods_data.csv", directory / "foods.csv")))
+
+
+@pytest.mark.parametrize("preferences", [
+    {"cuisine": "pakistani", "course": "main course", "keywords": ["chicken", "rice"], "max_cook_time": 45},
+    {"cuisine": "italian", "course": "dessert", "keywords": ["chocolate"], "max_cook_time": 20},
+    {"keywords": ["lentils"], "max_cook_time": None, "skipped_fields": ["cuisine", "course"]},
+])
+def test_evidence_explains_like_the_rows(bundle, preferences):
+    preferences = {"selected_ingredients": [], "excluded_ingredients": [], "offset": 0, **preferences}
+    recs, _ = recommend_foods(bundle.df, preferences, bundle.ranker, top_k=10, catalog_index=bundle.index)
+    assert len(recs) and "time_delta" in recs
+
+    rows = recs.to_dict("records")
+    assert explain_batch(recs, preferences) == [explain_recommendation(row, preferences) for row in rows]
@@ -0,0 +1,90 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from services.data_loader import REQUIRED_COLUMNS
+from services.live_catalog import CatalogJournal, LiveCatalog, delete_entries, journal_path
+
+
+@pytest.fixture
+def csv(tmp_path):
+    return shutil.copy("data/foods_data.csv", tmp_path / "foods.csv")
+
+
+def new_recipe(csv, name: str) -> dict:
+    """A raw CSV row under a new name, as an upsert record."""
+    row = pd.read_csv(csv, dtype=str, nrows=1).iloc[0]
+    record = {col: row[col] for col in REQUIRED_COLUMNS}
+    record.update(name=name, summary=f"a {name}")
+    return record
+
+
+def names(catalog: LiveCatalog) -> set:
+    bundle = catalog.current
+    live = ~bundle.index.deleted if bundle.index.deleted is not None else slice(None)
+    return set(bundle.df["name"][live])
+
+
+def test_submit_refresh_compact_reopen(csv):
+    writer = LiveCatalog.open(str(csv))
+    reader = LiveCatalog.open(str(csv))
+    original = writer.current.version
+    removed = writer.current.df["food_id"].iloc[0]
+
+    version = writer.upsert([new_recipe(csv, "zanzibar mango tartlet")])
+    writer.delete([str(removed)])
+    assert version != original
+    assert "zanzibar mango tartlet" in names(writer)
+    assert writer.current.index.positions_of([removed])[0] == -1
+
+    # Another process picks the edits up from the journal, at the same version
+    assert reader.refresh()
+    assert names(reader) == names(writer)
+    assert reader.current.version == writer.current.version
+
+    compacted = writer.compact()
+    assert writer.current.index.deleted is None or not writer.current.index.deleted.any()
+    assert names(writer) == names(reader)
+    # The journal now starts at the checkpoint, which holds every edit so far
+    assert CatalogJournal(journal_path(str(csv))).start() > 0
+
+    reopened = LiveCatalog.open(str(csv))
+    assert reopened.current.version == compacted
+    assert names(reopened) == names(writer)
+
+    reader.refresh()
+    assert reader.current.version == compacted
+    writer.upsert([new_recipe(csv, "kerala banana fritter")])
+    for catalog in (reader, reopened):
+        catalog.refresh()
+        assert "kerala banana fritter" in names(catalog)
+        assert catalog.current.version == writer.current.version
+
+
+def test_bad_ids_are_rejected_and_bad_entries_skipped(csv):
+    catalog = LiveCatalog.open(str(csv))
+    for food_id in ("-1", 2**64, 1.5, True):
+        with pytest.raises(ValueError):
+            delete_entries([food_id])
+
+    removed = catalog.current.df["food_id"].iloc[3]
+    journal = CatalogJournal(journal_path(str(csv)))
+    journal.append([{"op": "delete", "food_id": "-1"}, {"op": "zap", "food_id": "1"}])
+    with open(journal_path(str(csv)), "ab") as f:
+        f.write(b"{not json\n")
+    journal.append(delete_entries([removed]))
+
+    catalog.refresh()
+    assert catalog.current.index.positions_of([removed])[0] == -1
+    assert int(catalog.current.index.deleted.sum()) == 1
+    assert LiveCatalog.open(str(csv)).current.version == catalog.current.version
+
+
+def test_without_journal_versions_still_change(csv):
+    catalog = LiveCatalog(LiveCatalog.open(str(csv)).current)
+    before = catalog.current.version
+    after = catalog.delete([str(catalog.current.df["food_id"].iloc[0])])
+    assert after != before
+    assert not os.path.exists(journal_path(str(csv)))
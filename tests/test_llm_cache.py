@@ -0,0 +1,57 @@
+import asyncio
+
+from aiohttp.test_utils import TestServer
+from langchain_groq import ChatGroq
+
+from services.llm_cache import ExtractionCache
+from services.llm_client import AsyncExtractionClient, FallbackPreferences, stand_in_app
+
+
+def test_hit_on_normalized_message(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), namespace="model:prompt")
+    cache.put("Spicy Thai noodles!", {"cuisine": "thai"})
+
+    assert cache.get("spicy   thai noodles") == {"cuisine": "thai"}
+    assert cache.get("mild thai noodles") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_other_namespace_is_dropped_on_open(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    ExtractionCache(path, namespace="old-model:prompt").put("thai", {"cuisine": "thai"})
+
+    cache = ExtractionCache(path, namespace="new-model:prompt")
+    assert len(cache) == 0
+    assert cache.get("thai") is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), namespace="n", max_entries=4)
+    cache.put("first", {"keywords": ["a"]})
+    cache.put("second", {"keywords": ["b"]})
+    cache.put("third", {"keywords": ["c"]})
+
+    # Two keys per message (exact and normalized): only the newest two fit
+    assert len(cache) == 4
+    assert cache.get("first") is None
+    assert cache.get("third") == {"keywords": ["c"]}
+
+
+def test_client_caches_answers_but_not_fallbacks(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), namespace="n")
+
+    async def run(app, *messages):
+        async with TestServer(app) as server:
+            llm = ChatGroq(model="stand-in", api_key="test", base_url=str(server.make_url("")), max_retries=0)
+            client = AsyncExtractionClient(llm=llm, timeout=0.5, cache=cache)
+            return [await client.aextract(message) for message in messages]
+
+    slow = stand_in_app(latency=2.0)
+    [prefs] = asyncio.run(run(slow, "zq vx first"))
+    assert isinstance(prefs, FallbackPreferences)
+    assert cache.get("zq vx first") is None
+
+    fast = stand_in_app(latency=0.0, reply={"cuisine": "thai"})
+    answers = asyncio.run(run(fast, "zq vx second", "ZQ  vx second!"))
+    assert [prefs["cuisine"] for prefs in answers] == ["thai", "thai"]
+    assert len(fast["requests"]) == 1
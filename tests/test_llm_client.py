@@ -0,0 +1,53 @@
+import asyncio
+
+from aiohttp.test_utils import TestServer
+from langchain_groq import ChatGroq
+
+from services import llm_client
+from services.llm_client import AsyncExtractionClient, stand_in_app
+
+# Matched by neither the rule extractor nor the cache, so it reaches the LLM
+MESSAGE = "zq vx unparseable"
+
+
+async def _extract(app, timeout, previous=None, backoff=0.2):
+    async with TestServer(app) as server:
+        llm = ChatGroq(model="stand-in", api_key="test", base_url=str(server.make_url("")), max_retries=0)
+        client = AsyncExtractionClient(llm=llm, timeout=timeout, backoff=backoff)
+        return client, await client.aextract(MESSAGE, previous)
+
+
+def test_answer_within_deadline():
+    app = stand_in_app(latency=0.01, reply={"cuisine": "thai"})
+    client, prefs = asyncio.run(_extract(app, timeout=5))
+    assert prefs["cuisine"] == "thai"
+    assert (client.timeouts, client.failures) == (0, 0)
+
+
+def test_deadline_falls_back_to_previous():
+    app = stand_in_app(latency=2.0, reply={"cuisine": "thai"})
+    client, prefs = asyncio.run(_extract(app, timeout=0.2, previous={"cuisine": "indian"}))
+    assert prefs["cuisine"] == "indian"
+    assert client.timeouts == 1
+    assert len(app["requests"]) == 1
+
+
+def test_failures_retry_with_jittered_backoff(monkeypatch):
+    bounds = []
+    uniform = llm_client.random.uniform
+
+    def record(low, high):
+        bounds.append((low, high))
+        return uniform(low, high)
+
+    monkeypatch.setattr(llm_client.random, "uniform", record)
+    app = stand_in_app(latency=0.0, failure_rate=1.0)
+    client, prefs = asyncio.run(_extract(app, timeout=5, previous={"cuisine": "indian"}, backoff=0.1))
+
+    assert prefs["cuisine"] == "indian"
+    assert client.failures == 1
+    # max_retries=2: three attempts, waiting a jittered 0.1 then 0.2 seconds
+    assert len(app["requests"]) == 3
+    assert bounds == [(0.05, 0.1), (0.1, 0.2)]
+    gaps = [b - a for a, b in zip(app["requests"], app["requests"][1:])]
+    assert gaps[0] >= 0.05 and gaps[1] >= 0.1
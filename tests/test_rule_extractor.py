@@ -0,0 +1,33 @@
+import shutil
+
+import pandas as pd
+
+from services.data_loader import REQUIRED_COLUMNS
+from services.live_catalog import LiveCatalog
+from services.rule_extractor import CatalogRules, RuleExtractor
+
+
+def test_parses_catalog_vocabulary():
+    rules = RuleExtractor(cuisines={"thai"}, courses={"dessert"}, ingredients={"mango", "coconut milk"})
+    prefs, confidence = rules.parse("thai dessert with mango, no coconut milk, under 20 minutes")
+
+    assert prefs["cuisine"] == "thai"
+    assert prefs["course"] == "dessert"
+    assert prefs["keywords"] == ["mango"]
+    assert prefs["excluded_ingredients"] == ["coconut milk"]
+    assert prefs["max_cook_time"] == 20
+    assert confidence == 1.0
+
+
+def test_follows_catalog_edits(tmp_path):
+    csv = shutil.copy("data/foods_data.csv", tmp_path / "foods.csv")
+    catalog = LiveCatalog.open(str(csv))
+    rules = CatalogRules(catalog)
+    assert rules.parse("zanzibari food")[0]["cuisine"] is None
+
+    row = pd.read_csv(csv, dtype=str, nrows=1).iloc[0]
+    record = {col: row[col] for col in REQUIRED_COLUMNS}
+    record.update(name="spiced octopus", cuisine="Zanzibari")
+    catalog.upsert([record])
+
+    assert rules.parse("zanzibari food")[0]["cuisine"] == "zanzibari"
@@ -0,0 +1,133 @@
+import asyncio
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+import pytest
+from aiohttp import web
+from PIL import Image
+
+from services import thumbnails
+from services.thumbnails import ThumbnailCache, stand_in_app, thumbnail_key
+
+
+@contextmanager
+def serving(app):
+    """Run ``app`` on a free local port in a background thread; yields its base URL."""
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.run_until_complete(runner.cleanup())
+        loop.close()
+
+
+def photo(seed: int) -> bytes:
+    # Noise so every thumbnail weighs about the same few KB
+    bands = [Image.effect_noise((400, 300), 40 + seed + i) for i in range(3)]
+    out = io.BytesIO()
+    Image.merge("RGB", bands).save(out, "JPEG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def fetched(monkeypatch):
+    """Serve generated images instead of fetching; records the URLs asked for."""
+    urls = []
+
+    def fetch(url, timeout=None):
+        urls.append(url)
+        return photo(len(urls))
+
+    monkeypatch.setattr(thumbnails, "fetch_image", fetch)
+    return urls
+
+
+def test_evicts_least_recently_used_past_max_bytes(tmp_path, fetched):
+    one = len(ThumbnailCache(str(tmp_path / "probe"))._encode(photo(0)))
+    cache = ThumbnailCache(str(tmp_path / "thumbs"), max_bytes=int(one * 2.5))
+
+    first = cache.get(1, "http://img/1.jpg")
+    cache.get(2, "http://img/2.jpg")
+    assert cache.cached(1, "http://img/1.jpg") == first  # now the most recent
+    cache.get(3, "http://img/3.jpg")
+
+    assert cache.total_bytes <= cache.max_bytes
+    assert cache.cached(2, "http://img/2.jpg") is None
+    assert cache.cached(1, "http://img/1.jpg") == first
+    assert sorted(os.listdir(cache.directory)) == sorted(
+        f"{thumbnail_key(i, f'http://img/{i}.jpg')}.webp" for i in (1, 3)
+    )
+    # Hits never refetch
+    assert fetched == [f"http://img/{i}.jpg" for i in (1, 2, 3)]
+
+
+def test_changed_url_gets_a_new_thumbnail(tmp_path, fetched):
+    cache = ThumbnailCache(str(tmp_path))
+    old = cache.get(7, "http://img/old.jpg")
+    new = cache.get(7, "http://img/new.jpg")
+
+    assert new != old
+    assert fetched == ["http://img/old.jpg", "http://img/new.jpg"]
+    assert cache.cached(7, "http://img/new.jpg") == new
+
+
+def test_reopened_cache_keeps_entries(tmp_path, fetched):
+    cache = ThumbnailCache(str(tmp_path))
+    path = cache.get(1, "http://img/1.jpg")
+
+    reopened = ThumbnailCache(str(tmp_path))
+    assert reopened.cached(1, "http://img/1.jpg") == path
+    assert reopened.total_bytes == cache.total_bytes
+
+
+def test_failed_fetch_is_not_retried(tmp_path, monkeypatch):
+    calls = []
+
+    def fail(url, timeout=None):
+        calls.append(url)
+        raise OSError("unreachable")
+
+    monkeypatch.setattr(thumbnails, "fetch_image", fail)
+    cache = ThumbnailCache(str(tmp_path))
+    assert cache.get(1, "http://img/1.jpg") is None
+    assert cache.get(1, "http://img/1.jpg") is None
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("url", ["file:///etc/passwd", "ftp://example.com/a.jpg", "data:image/png;base64,AAAA"])
+def test_fetch_accepts_only_http(url):
+    with pytest.raises(ValueError):
+        thumbnails.fetch_image(url)
+
+
+def test_redirect_to_other_scheme_is_refused(tmp_path):
+    async def redirect(request):
+        raise web.HTTPFound("ftp://example.com/photo.jpg")
+
+    app = web.Application()
+    app.router.add_get("/{path:.*}", redirect)
+    cache = ThumbnailCache(str(tmp_path))
+    with serving(app) as base:
+        assert cache.get(1, f"{base}/photo.jpg") is None
+    assert len(cache) == 0
+
+
+def test_fetches_from_stand_in_host(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), size=(64, 64))
+    with serving(stand_in_app(size=(400, 300))) as base:
+        path = cache.get(1, f"{base}/photo.jpg")
+        assert cache.get(2, f"{base}/missing/photo.jpg") is None
+
+    with Image.open(path) as image:
+        assert max(image.size) == 64